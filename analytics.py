@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+
+# ────────────────────────────────────────────────
+# Demographic cross-tabs for simulated responses.
+# Responses and persona attributes live in one columnar frame; a cube of
+# counts indexed by (dimension level, question, option) is built once with
+# np.bincount, and every cross-tab / breakdown page is a slice of it.
+PERSONA_FIELDS = ["name", "age", "gender", "nation", "occupation"]
+DIMENSIONS     = ["age_group", "gender", "nation", "occupation"]
+
+AGE_BINS   = [0, 18, 25, 35, 45, 55, 65, 200]
+AGE_LABELS = ["Under 18", "18-24", "25-34", "35-44", "45-54", "55-64", "65+"]
+UNKNOWN    = "Unknown"
+# ────────────────────────────────────────────────
+
+def parse_personas(raw):
+    '''
+    Parse "name,age,gender,nation,occupation | ..." (one entry per character,
+    in character-list order) into a DataFrame
+    '''
+    rows = []
+    for entry in raw.strip().split('|'):
+        fields = [f.strip() for f in entry.split(',')]
+        if not any(fields):
+            continue
+        # Occupations sometimes contain commas; keep them together
+        fields = fields[:len(PERSONA_FIELDS) - 1] + [", ".join(fields[len(PERSONA_FIELDS) - 1:])]
+        rows.append(fields + [""] * (len(PERSONA_FIELDS) - len(fields)))
+    return pd.DataFrame(rows, columns=PERSONA_FIELDS)
+
+def encode_codes(response_lines, n_questions):
+    '''
+    Letter codes -> int8 matrix (respondents x questions), 0 for "a",
+    1 for "b", ...; -1 where the answer is missing or unreadable
+    '''
+    padded = [(line + [''] * n_questions)[:n_questions] for line in response_lines]
+    letters = np.array(padded, dtype='<U1').reshape(len(padded), n_questions)
+    codes = letters.view(np.uint32).astype(np.int64) - ord('a')
+    codes[(codes < 0) | (codes > 25)] = -1
+    return codes.astype(np.int8)
+
+def match_personas(personas, n, persona_index=None):
+    '''
+    One persona row per respondent. `persona_index` gives each respondent's
+    row in `personas` (None where it couldn't be matched); without it,
+    respondents and personas are matched by position.
+    '''
+    if personas is None:
+        personas = pd.DataFrame(columns=PERSONA_FIELDS)
+    rows = range(n) if persona_index is None else [-1 if p is None else p for p in persona_index]
+    return personas.reindex(rows).reset_index(drop=True) # Unmatched rows come back empty
+
+def build_response_frame(questions, response_lines, personas=None, persona_index=None):
+    '''
+    One row per respondent: persona attributes plus one categorical column
+    per question holding the option index
+    '''
+    n = len(response_lines)
+    codes = encode_codes(response_lines, len(questions))
+    frame = pd.DataFrame({f"Q{i+1}": codes[:, i] for i in range(len(questions))})
+    personas = match_personas(personas, n, persona_index)
+
+    # Age bands keep their natural order; free-text fields are categorised as-is
+    ages = pd.to_numeric(personas["age"].astype(str).str.extract(r"(\d+)")[0], errors='coerce')
+    frame["age_group"] = (pd.cut(ages, bins=AGE_BINS, labels=AGE_LABELS, right=False)
+                          .cat.add_categories(UNKNOWN).fillna(UNKNOWN))
+    for field in ("gender", "nation", "occupation"):
+        values = personas[field].astype("string").str.strip()
+        if field == "gender":
+            values = values.str.capitalize()
+        frame[field] = values.replace("", pd.NA).fillna(UNKNOWN).astype("category")
+    return frame
+
+def build_cube(frame, questions, dimensions=DIMENSIONS):
+    '''
+    Count cube: for each dimension, an array of shape
+    (levels, questions, max options) holding respondent counts
+    '''
+    n_q = len(questions)
+    n_opt = max((len(choices) for _, choices in questions), default=0)
+    codes = frame[[f"Q{i+1}" for i in range(n_q)]].to_numpy(dtype=np.int64)
+    valid = (codes >= 0) & (codes < n_opt)
+
+    cube = {"questions": questions, "dimensions": {}}
+    for dim in dimensions:
+        levels = list(frame[dim].cat.categories)
+        level_codes = frame[dim].cat.codes.to_numpy(dtype=np.int64)
+        flat = (level_codes[:, None] * n_q + np.arange(n_q)) * n_opt + codes
+        counts = np.bincount(flat[valid], minlength=len(levels) * n_q * n_opt)
+        cube["dimensions"][dim] = {
+            "levels": levels,
+            "counts": counts.reshape(len(levels), n_q, n_opt),
+        }
+    return cube
+
+def crosstab(cube, dimension, question, normalize=False):
+    '''
+    Rows = levels of `dimension`, columns = options of question `question`
+    (0-based). With `normalize`, each row is a share of that level's answers.
+    '''
+    entry = cube["dimensions"][dimension]
+    choices = cube["questions"][question][1]
+    table = pd.DataFrame(entry["counts"][:, question, :len(choices)],
+                         index=pd.Index(entry["levels"], name=dimension), columns=choices)
+    table = table[table.sum(axis=1) > 0]
+    if normalize:
+        table = table.div(table.sum(axis=1), axis=0)
+    return table
+
+def breakdown_dimensions(cube, min_levels=2, max_levels=12):
+    '''
+    Dimensions worth a breakdown chart: more than one answered level, but not
+    so many that the chart becomes unreadable
+    '''
+    useful = []
+    for dim, entry in cube["dimensions"].items():
+        answered = int((entry["counts"].sum(axis=(1, 2)) > 0).sum())
+        if min_levels <= answered <= max_levels:
+            useful.append(dim)
+    return useful
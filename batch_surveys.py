@@ -0,0 +1,121 @@
+import os, re, time, shutil, asyncio, zipfile, tempfile, functools, contextvars
+from concurrent.futures import ThreadPoolExecutor
+import create_survey
+
+# ────────────────────────────────────────────────
+# Batch mode: many topics, one request.
+# Every topic goes ideate -> QSF -> (optional) Qualtrics upload on its own
+# task. Gemini calls and Qualtrics imports wait on create_survey's per-minute
+# budgets, shared with every other command, so a long topic list is throttled
+# instead of tripping rate limits. Batch calls run on their own bounded pool,
+# so threads waiting on the budget never tie up asyncio's default executor
+# (live simulations, report rendering, delivery).
+MAX_TOPICS        = 50
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))  # Topics in flight per batch
+BATCH_WORKERS     = int(os.getenv("BATCH_WORKERS", "8"))      # Threads for all batches in the process
+BUNDLE_DIR        = "survey_data/batches"
+# ────────────────────────────────────────────────
+
+EXECUTOR = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="batch")
+
+async def in_worker(func, *args, **kwargs):
+    '''
+    asyncio.to_thread, but on the batch pool (the context is carried over
+    the same way, for cassettes and profiling spans)
+    '''
+    call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(EXECUTOR, call)
+
+def parse_topics(text):
+    '''
+    One topic per line; bullets / numbering and duplicates are dropped
+    '''
+    topics, seen = [], set()
+    for line in text.splitlines():
+        topic = re.sub(r'^\s*(?:[-*•]|\d+[.)])\s*', '', line).strip()
+        if topic and topic.lower() not in seen:
+            seen.add(topic.lower())
+            topics.append(topic)
+    return topics
+
+def slugify(topic):
+    return re.sub(r'[^\w-]+', '_', topic).strip('_')[:60] or "survey"
+
+async def build_survey(index, topic, info, likert, upload, workdir, limit):
+    '''
+    Run one topic through the pipeline
+    Returns a result dict; failures are recorded rather than raised
+    '''
+    name = f"{index:02d}_{slugify(topic)}"
+    result = {'topic': topic, 'md': None, 'qsf': None, 'admin_url': "", 'preview_url': "", 'error': None}
+    async with limit:
+        try:
+            ideate = create_survey.ideate_survey_likert if likert else create_survey.ideate_survey_mc
+            survey = await in_worker(ideate, topic, info)
+
+            result['md'] = os.path.join(workdir, "md", f"{name}.md")
+            with open(result['md'], 'w', encoding='utf-8') as f:
+                f.write(survey)
+
+            compile_qsf = create_survey.create_qsf_likert if likert else create_survey.create_qsf_mc
+            result['qsf'] = await in_worker(
+                compile_qsf, survey, topic, output_filename=os.path.join(workdir, "qsf", f"{name}.qsf")
+            )
+
+            if upload:
+                result['admin_url'], result['preview_url'] = await in_worker(
+                    create_survey.upload_to_qualtrics, topic, result['qsf']
+                )
+                if not result['admin_url']:
+                    result['error'] = "Qualtrics import failed"
+        except Exception as e:
+            print(f"[WARN] Batch survey '{topic}' failed: {e}")
+            result['error'] = f"{type(e).__name__}: {e}"
+    return result
+
+def summarize_batch(results, upload):
+    lines = []
+    for i, r in enumerate(results, 1):
+        status = "❌" if r['error'] or not r['qsf'] else "✅"
+        lines.append(f"{status} {i}. **{r['topic']}**" + (f" — {r['error']}" if r['error'] else ""))
+        if r['admin_url']:
+            lines.append(f"   Preview: {r['preview_url']}\n   Admin: {r['admin_url']}")
+    done = sum(1 for r in results if r['qsf'] and not r['error'])
+    header = f"Built {done}/{len(results)} surveys" + (" and uploaded them to Qualtrics." if upload else ".")
+    return "\n".join([header] + lines)
+
+def write_bundle(workdir, results, summary, bundle_dir=BUNDLE_DIR):
+    '''
+    Zip the MD/QSF files plus the summary
+    Returns the path to the zip
+    '''
+    os.makedirs(bundle_dir, exist_ok=True)
+    fd, bundle = tempfile.mkstemp(prefix=f"surveys_{time.strftime('%Y%m%d-%H%M%S')}_", suffix=".zip", dir=bundle_dir)
+    os.close(fd)
+    with zipfile.ZipFile(bundle, 'w', compression=zipfile.ZIP_DEFLATED) as z:
+        z.writestr("summary.md", summary)
+        for r in results:
+            for path in (r['md'], r['qsf']):
+                if path and os.path.exists(path):
+                    z.write(path, os.path.relpath(path, workdir))
+    return bundle
+
+async def run_batch(topics, info, likert=False, upload=False, bundle_dir=BUNDLE_DIR):
+    '''
+    Build a survey for every topic concurrently
+    Returns (bundle path, results, summary text)
+    '''
+    workdir = tempfile.mkdtemp(prefix="autoscience-batch-")
+    try:
+        os.makedirs(os.path.join(workdir, "md"))
+        os.makedirs(os.path.join(workdir, "qsf"))
+        limit = asyncio.Semaphore(BATCH_CONCURRENCY)
+        results = await asyncio.gather(*(
+            build_survey(i, topic, info, likert, upload, workdir, limit)
+            for i, topic in enumerate(topics, 1)
+        ))
+        summary = summarize_batch(results, upload)
+        bundle = await asyncio.to_thread(write_bundle, workdir, results, summary, bundle_dir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return bundle, results, summary
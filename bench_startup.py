@@ -0,0 +1,68 @@
+import os, sys, json, subprocess, statistics
+
+# ────────────────────────────────────────────────
+# Startup benchmark: time `import bot` in fresh interpreters and fail if it
+# gets slower than the budget or starts pulling in heavy modules eagerly.
+#   python bench_startup.py [runs]
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "1500"))
+DEFERRED_MODULES  = ["create_survey", "display_data", "qualtrics_export", "batch_surveys", "export",
+                     "google.genai", "matplotlib", "pandas", "numpy", "fpdf", "pypdf", "pyarrow"]
+TOP_N = 10
+# ────────────────────────────────────────────────
+
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import bot
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps({"ms": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (DEFERRED_MODULES,)
+
+def probe(env, importtime=False):
+    args = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", PROBE]
+    result = subprocess.run(args, env=env, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        sys.exit(result.stderr)
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+def slowest_imports(importtime_log):
+    '''
+    Top modules by cumulative import time from `-X importtime` output
+    '''
+    rows = []
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        rows.append((int(cumulative), name))
+    return sorted(rows, reverse=True)[:TOP_N]
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    env = dict(os.environ, PREWARM="0", STATE_BACKEND="memory")
+
+    timings, loaded = [], set()
+    for _ in range(runs):
+        result, _ = probe(env)
+        timings.append(result["ms"])
+        loaded.update(result["loaded"])
+
+    _, log = probe(env, importtime=True)
+    print(f"import bot: median {statistics.median(timings):.0f}ms, "
+          f"min {min(timings):.0f}ms, max {max(timings):.0f}ms over {runs} runs")
+    print("Slowest imports (cumulative):")
+    for micros, name in slowest_imports(log):
+        print(f"  {micros / 1000:8.1f}ms  {name.strip()}")
+
+    failed = False
+    if loaded:
+        print(f"[FAIL] Imported at startup but should be lazy: {', '.join(sorted(loaded))}")
+        failed = True
+    if statistics.median(timings) > STARTUP_BUDGET_MS:
+        print(f"[FAIL] Startup exceeds the {STARTUP_BUDGET_MS:.0f}ms budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
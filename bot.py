@@ -1,60 +1,99 @@
-import os, random, tempfile, discord
+import os, re, json, random, tempfile, time, asyncio, discord
 from dotenv import load_dotenv
 
-# See implementations of these functions in create_survey.py
-from create_survey import (
-    ideate_survey_mc, ideate_survey_likert, revise_survey,
-    create_qsf_mc, create_qsf_likert, upload_to_qualtrics,
-    simulate_single_response, simulate_multiple_responses,
-    create_character_list, revise_character_list,
-    extract_data, clarify_survey
-)
+# Loaded once, here, before anything reads its configuration
+load_dotenv()
 
-from display_data import process_data
+from checkpoint import STORE, get_session, checkpoint, save_stage, load_stage
+from startup import lazy_import, prewarm
+import profiling
+import cassette
+from delivery import send_file
 
-load_dotenv()
+# Heavy modules load on first use (or when pre-warmed after connecting);
+# every call through them is timed when a command is being profiled
+create_survey    = profiling.instrument(lazy_import("create_survey"))    # Gemini prompts + Qualtrics helpers
+display_data     = profiling.instrument(lazy_import("display_data"))     # matplotlib / pandas reporting
+qualtrics_export = profiling.instrument(lazy_import("qualtrics_export"))
+batch_surveys    = profiling.instrument(lazy_import("batch_surveys"))
+export           = profiling.instrument(lazy_import("export"))           # Columnar (Parquet / CSV) response export
 
-TOKEN = os.getenv("DISCORD_TOKEN")
+TOKEN   = os.getenv("DISCORD_TOKEN")
+PREWARM = os.getenv("PREWARM", "1") != "0" # Import heavy modules in the background after connecting
 
 # ────────────────────────────────────────────────
-# Bot states
-AWAITING_SURVEY   = False # Expecting user approval on survey draft
-CLARIFYING_SURVEY = False # Expecting user to answer clarifying questions
-AWAITING_SIM      = False # Expecting user approval on generated simulation characters 
-
-CURR_SURVEY = "" # Store survey 
-TOPIC       = "" # Store survey topic
-LIKERT      = True # Likert format or MC format
+# Bot states live in one checkpointed Session per channel (see checkpoint.py)
+SIM_BATCH_SIZE       = 5  # Characters simulated per Gemini call
+LIVE_UPDATE_INTERVAL = 20 # Minimum seconds between live tally updates
+# ────────────────────────────────────────────────
+
+# ────────────────────────────────────────────────
+# Run modes (see launcher.py)
+#   default            one discord.Client, one process
+#   SHARD_MODE=auto    AutoShardedClient: every shard in this process
+#   SHARD_ID/COUNT     one shard of a multi-process deployment
+SHARD_MODE  = os.getenv("SHARD_MODE", "")
+SHARD_ID    = os.getenv("SHARD_ID")
+SHARD_COUNT = os.getenv("SHARD_COUNT")
 # ────────────────────────────────────────────────
 
 intents = discord.Intents.default()
 intents.message_content = True
-client = discord.Client(intents=intents)
+
+if SHARD_ID is not None:
+    client = discord.Client(intents=intents, shard_id=int(SHARD_ID), shard_count=int(SHARD_COUNT))
+elif SHARD_MODE == 'auto':
+    client = discord.AutoShardedClient(
+        intents=intents, shard_count=int(SHARD_COUNT) if SHARD_COUNT else None
+    )
+else:
+    client = discord.Client(intents=intents)
+
+@client.event
+async def setup_hook():
+    client.loop.create_task(STORE.run_flusher())
 
 @client.event
 async def on_ready():
-    print(f'{client.user.name} has connected to Discord!')
+    shards = f" (shard {SHARD_ID}/{SHARD_COUNT})" if SHARD_ID is not None else ""
+    print(f'{client.user.name} has connected to Discord!{shards}')
+    if PREWARM:
+        prewarm(create_survey.__wrapped__, display_data.__wrapped__, qualtrics_export.__wrapped__,
+                batch_surveys.__wrapped__, export.__wrapped__)
 
 # ────────────────────────────────────────────────
-def detect_action(content: str) -> str | None:
+def detect_action(content: str, session) -> str | None:
     """Return a symbolic label describing what the user just asked for."""
     lower = content.lower()
 
-    if AWAITING_SURVEY:
+    if session.sim_running and 'autoscience,' in lower and 'stop' in lower:
+        return 'STOP_SIM'
+
+    if session.awaiting_survey:
         return 'SURVEY_OK' if 'ok' in lower else 'SURVEY_REV'
 
-    if CLARIFYING_SURVEY:
+    if session.clarifying_survey:
         if any(k in lower for k in ('1', 'mc', 'multiple choice')):
             return 'CLARIFY_MC'
         if any(k in lower for k in ('2', 'grid', 'likert')):
             return 'CLARIFY_LIKERT'
 
-    if AWAITING_SIM:
+    # Only an explicit answer counts; anything else must not revise the characters or drop the progress
+    if session.resuming_sim:
+        if re.fullmatch(r'\s*(autoscience,\s*)?(ok|okay)[\s.!]*', lower):     return 'SIM_RESUME'
+        if re.fullmatch(r'\s*(autoscience,\s*)?(cancel|stop)[\s.!]*', lower): return 'SIM_CANCEL'
+        return None
+
+    if session.awaiting_sim:
         return 'SIM_OK' if 'ok' in lower else 'SIM_REV'
 
     if lower == 'hello there':                                    return 'HELLO'
     if 'autoscience,' in lower and 'survey about' in lower:       return 'MAKE_SURVEY'
+    if 'autoscience,' in lower and 'batch survey' in lower:       return 'BATCH_SURVEYS'
+    if re.fullmatch(r'\s*autoscience,\s*profile(\s+(on|off|next))?[\s.!]*', lower): return 'PROFILE'
+    if 'autoscience,' in lower and 'results' in lower and re.search(r'\bsv_\w+', lower): return 'GET_RESULTS'
     if 'autoscience,' in lower and 'qsf'        in lower:         return 'GET_QSF'
+    if 'autoscience,' in lower and 'export'     in lower:         return 'EXPORT'
     if 'autoscience,' in lower and 'report'     in lower:         return 'GET_REPORT'
     if 'autoscience,' in lower and 'md'         in lower:         return 'GET_MD'
     if 'autoscience,' in lower and 'simulate'   in lower:         return 'SIMULATE'
@@ -66,126 +105,342 @@ def detect_action(content: str) -> str | None:
     return None
 # ────────────────────────────────────────────────
 
+async def run_live_simulation(channel, session):
+    """Simulate responses batch by batch, posting a running tally as they arrive."""
+    survey, topic, workdir = session.curr_survey, session.topic, session.workdir
+
+    file_path = session.path("md_files", "simulated_characters", f"{topic.replace(' ', '_')}_characters.md")
+    with open(file_path, 'r', encoding='utf-8') as f:
+        characters = f.read()
+    entries = create_survey.character_entries(characters)
+    batches = create_survey.split_character_list(characters, SIM_BATCH_SIZE)
+
+    # Pick up where a restarted run left off if the characters haven't changed
+    progress = load_stage(session, 'simulation')
+    fresh = not progress or progress['characters'] != characters
+    if fresh:
+        # Blocking Gemini calls run in a worker thread so "stop" can still be heard
+        structure = await asyncio.to_thread(create_survey.extract_survey_structure, survey, workdir)
+        personas_file = await asyncio.to_thread(create_survey.extract_persona_attributes, topic, workdir)
+        progress = {'characters': characters, 'structure': structure,
+                    'transcripts': [], 'responses': [], 'respondents': []}
+        checkpoint(session, session.path("survey_data", "survey.md"), personas_file)
+    elif progress['transcripts']:
+        await channel.send(f"Resuming after {len(progress['responses'])} respondent(s).")
+
+    questions = display_data.parse_survey_string(progress['structure'])
+    transcripts, responses = progress['transcripts'], progress['responses']
+    # Character index per respondent, None if unmatched (by position for progress saved before this was kept)
+    respondents = progress.setdefault('respondents', list(range(len(responses))))
+    tally, last_update = display_data.update_tally([dict() for _ in questions], responses), 0.0
+
+    personas = await asyncio.to_thread(export.read_personas, session.path("survey_data", "personas.md"))
+    if personas is not None and len(personas) != len(entries):
+        personas = None
+        if fresh:
+            await channel.send(
+                "I couldn't match the respondent profiles to the character list, "
+                "so results won't be broken down by demographics."
+            )
+
+    # Respondent-level export, one part file per batch; rebuilt if lost across a restart
+    if fresh or not export.has_export(topic, workdir):
+        await asyncio.to_thread(export.start_export, topic, questions, workdir)
+        if responses:
+            await asyncio.to_thread(export.write_part, topic, questions, responses, personas, 0, respondents, workdir)
+
+    session.sim_running, session.stop_sim = True, False
+    checkpoint(session)
+    try:
+        for i in range(len(transcripts), len(batches)):
+            if session.stop_sim:
+                await channel.send(f"Stopping early after {len(responses)} respondent(s).")
+                break
+
+            text  = await asyncio.to_thread(create_survey.simulate_response_batch, survey, topic, batches[i])
+            codes = await asyncio.to_thread(create_survey.extract_response_codes, text)
+            lines = display_data.parse_response_string(codes)
+
+            # Respondents are tied to characters per batch, so a miscount only affects this batch
+            first = i * SIM_BATCH_SIZE
+            expected = len(entries[first:first + SIM_BATCH_SIZE])
+            if len(lines) == expected:
+                matched = list(range(first, first + expected))
+            else:
+                matched = [None] * len(lines)
+                await channel.send(
+                    f"Batch {i + 1} came back with {len(lines)} answer set(s) for {expected} character(s); "
+                    "those respondents are counted without demographics."
+                )
+
+            await asyncio.to_thread(export.write_part, topic, questions, lines, personas, len(responses), matched, workdir)
+            transcripts.append(text)
+            responses.extend(lines)
+            respondents.extend(matched)
+            display_data.update_tally(tally, lines)
+            save_stage(session, 'simulation', progress)
+
+            last_batch = (i == len(batches) - 1)
+            if last_batch or time.monotonic() - last_update >= LIVE_UPDATE_INTERVAL:
+                last_update = time.monotonic()
+                chart = await asyncio.to_thread(display_data.render_tally_chart, questions, tally,
+                                                session.path("survey_data", "live_tally.png"))
+                await send_file(channel, chart, display_data.summarize_tally(questions, tally, len(responses)))
+    finally:
+        session.sim_running = False
+
+    # Same on-disk outputs as the one-shot path, so the report pipeline is unchanged
+    os.makedirs(session.path("md_files", "simulated_responses"), exist_ok=True)
+    outfile = session.path("md_files", "simulated_responses", f"{topic.replace(' ', '_')}_survey_responses_batch.md")
+    with open(outfile, 'w', encoding='utf-8') as f:
+        f.write("\n\n".join(transcripts))
+    responses_file, respondents_file = session.path("survey_data", "responses.md"), session.path("survey_data", "respondents.json")
+    with open(responses_file, 'w', encoding='utf-8') as f:
+        f.write(" | ".join(",".join(line) for line in responses))
+    with open(respondents_file, 'w', encoding='utf-8') as f:
+        json.dump({"characters": len(entries), "personas": respondents}, f)
+
+    save_stage(session, 'simulation', None)
+    checkpoint(session, outfile, responses_file, respondents_file)
+    return outfile
+
 @client.event
 async def on_message(message: discord.Message):
-    global AWAITING_SURVEY, CLARIFYING_SURVEY, AWAITING_SIM
-    global CURR_SURVEY, TOPIC, LIKERT
-
     if message.author == client.user:
         return
 
-    action = detect_action(message.content)
+    # Restored from the checkpoint store on first use after a restart
+    session = get_session(message.channel.id)
+    cassette.use_session(session.key) # Gemini / Qualtrics traffic from here on belongs to this session
+    action  = detect_action(message.content, session)
+    if session.interrupted:
+        session.interrupted = False
+        if action is None: # Anything but ok / cancel just gets the notice
+            await message.channel.send(
+                "I was restarted in the middle of a simulation. "
+                "Reply 'ok' to pick up where I left off, or 'cancel' to drop it."
+            )
+            return
+    recorded = None
+    if action is not None: # Only messages meant for the bot; ordinary chat isn't recorded
+        recorded = await cassette.record_message(message, action)
+    outputs = [] # Files written by this step, checkpointed with the session state
+
+    profile_this = (
+        action not in (None, 'PROFILE')
+        and (session.profiling or session.profile_next)
+        and profiling.is_admin(message.author)
+    )
+    try:
+        with profiling.command(action):
+            if profile_this:
+                session.profile_next = False
+                await profiled_action(message, session, action, outputs)
+            else:
+                await handle_action(message, session, action, outputs)
+    finally:
+        checkpoint(session, *outputs)
+        cassette.record_done(recorded)
+
+async def profiled_action(message, session, action, outputs):
+    """Run one command under the profiler and post the results to the channel."""
+    async with profiling.profile(action) as prof:
+        await handle_action(message, session, action, outputs)
+    if prof is None:
+        await message.channel.send("(Another command is being profiled, so this one wasn't.)")
+        return
+    collapsed = await asyncio.to_thread(prof.write)
+    await send_file(message.channel, collapsed, prof.summary())
 
+async def handle_action(message, session, action, outputs):
     match action:
     # ───────── AWAITING SURVEY ──────────────────────────────
         case 'SURVEY_OK':
-            AWAITING_SURVEY = False
-            os.makedirs("md_files", exist_ok=True)
-            file_path = os.path.join("md_files", "generated_survey.md")
+            session.awaiting_survey = False
+            os.makedirs(session.path("md_files"), exist_ok=True)
+            file_path = session.path("md_files", "generated_survey.md")
             with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(CURR_SURVEY)
+                f.write(session.curr_survey)
+            outputs.append(file_path)
 
-            await message.channel.send(
-                content=f"Here's the final survey about {TOPIC}.",
-                file=discord.File(file_path)
-            )
+            await send_file(message.channel, file_path, f"Here's the final survey about {session.topic}.")
             await message.channel.send(
                 "\nI can now...\n"
                 "- Send the raw survey file (as MD or QSF)\n"
                 "- Upload to your Qualtrics account\n"
                 "- Simulate survey responses."
             )
-            (create_qsf_likert if LIKERT else create_qsf_mc)(CURR_SURVEY, TOPIC)
+            compile_qsf = create_survey.create_qsf_likert if session.likert else create_survey.create_qsf_mc
+            outputs.append(await asyncio.to_thread(compile_qsf, session.curr_survey, session.topic,
+                                                   output_filename=session.path("qsf_files", "generated_survey.qsf")))
 
         case 'SURVEY_REV':
-            survey_response = revise_survey(CURR_SURVEY, message.content.lower())
+            survey_response = await asyncio.to_thread(create_survey.revise_survey, session.curr_survey, message.content.lower())
             with tempfile.NamedTemporaryFile(mode='w+', delete=False, suffix='.md') as tmp:
                 tmp.write(survey_response); tmp.seek(0)
-                await message.channel.send(
-                    content="Here's the revised survey.",
-                    file=discord.File(tmp.name,
-                                      filename=f"survey_{TOPIC.replace(' ', '_')}.md")
-                )
+                await send_file(message.channel, tmp.name, "Here's the revised survey.",
+                                filename=f"survey_{session.topic.replace(' ', '_')}.md")
             os.remove(tmp.name)
-            CURR_SURVEY = survey_response
+            session.curr_survey = survey_response
             await message.channel.send("Would you like any more changes? If not, reply 'ok'.")
 
     # ───────── CLARIFYING ─────────────────────────────────
         case 'CLARIFY_MC' | 'CLARIFY_LIKERT':
-            LIKERT = (action == 'CLARIFY_LIKERT')
-            func   = ideate_survey_likert if LIKERT else ideate_survey_mc
-            survey_response = func(TOPIC, message.content.lower())
+            session.likert = (action == 'CLARIFY_LIKERT')
+            func   = create_survey.ideate_survey_likert if session.likert else create_survey.ideate_survey_mc
+            survey_response = await asyncio.to_thread(func, session.topic, message.content.lower())
 
             with tempfile.NamedTemporaryFile(mode='w+', delete=False, suffix='.md') as tmp:
                 tmp.write(survey_response); tmp.seek(0)
-                await message.channel.send(
-                    content=f"Here's a preview of the survey about {TOPIC}.",
-                    file=discord.File(tmp.name,
-                                      filename=f"survey_{TOPIC.replace(' ', '_')}.md")
-                )
+                await send_file(message.channel, tmp.name, f"Here's a preview of the survey about {session.topic}.",
+                                filename=f"survey_{session.topic.replace(' ', '_')}.md")
             os.remove(tmp.name)
 
             await message.channel.send("Need tweaks? If not, reply 'ok'.")
-            AWAITING_SURVEY, CURR_SURVEY, CLARIFYING_SURVEY = True, survey_response, False
+            session.awaiting_survey, session.curr_survey, session.clarifying_survey = True, survey_response, False
 
     # ───────── AWAITING SIM CHARACTERS ────────────────────
-        case 'SIM_OK':
-            AWAITING_SIM = False
-            await message.channel.send("Great. Simulating responses now...")
-            outfile = simulate_multiple_responses(CURR_SURVEY, TOPIC)
-            await message.channel.send(file=discord.File(outfile))
-
-            extract_data(CURR_SURVEY, TOPIC)
-            process_data()
+        case 'SIM_OK' | 'SIM_RESUME':
+            session.awaiting_sim = session.resuming_sim = False
             await message.channel.send(
-                "Here's the final report:",
-                file=discord.File("survey_data/report.pdf")
+                "Great. Simulating responses now — I'll post live results as they come in. "
+                "Say 'autoscience, stop' to finish early."
             )
+            outfile = await run_live_simulation(message.channel, session)
+            await send_file(message.channel, outfile)
+
+            # Rendering is CPU-bound; keep it off the event loop
+            report = await asyncio.to_thread(display_data.process_data, session.likert, session.workdir)
+            outputs.append(report)
+            await send_file(message.channel, report, "Here's the final report:")
+
+        case 'SIM_CANCEL':
+            session.resuming_sim = False
+            save_stage(session, 'simulation', None)
+            await message.channel.send("Okay, I've dropped the unfinished simulation.")
 
         case 'SIM_REV':
             await message.channel.send("Here is the revised character list.")
-            outfile = revise_character_list(message.content.lower(), TOPIC)
-            await message.channel.send(file=discord.File(outfile))
+            outfile = await asyncio.to_thread(create_survey.revise_character_list,
+                                              message.content.lower(), session.topic, session.workdir)
+            outputs.append(outfile)
+            await send_file(message.channel, outfile)
             await message.channel.send("Further changes? If not, reply 'ok'.")
 
+        case 'STOP_SIM':
+            session.stop_sim = True
+            await message.channel.send("Okay, I'll stop after the current batch.")
+
     # ───────── COMMANDS THAT SET/READ STATE ───────────────
         case 'MAKE_SURVEY':
             start = message.content.lower().find('survey about') + len('survey about')
-            TOPIC = message.content[start:].strip()
+            session.topic = message.content[start:].strip()
             await message.channel.send(
-                f"Hello, I'm AutoScience. Let me help you create a survey about {TOPIC}. "
+                f"Hello, I'm AutoScience. Let me help you create a survey about {session.topic}. "
                 "Please give me a moment to think."
             )
-            clarify_qs = clarify_survey(TOPIC) + \
+            clarify_qs = await asyncio.to_thread(create_survey.clarify_survey, session.topic) + \
                 "\nAdditionally, would you like the survey format to be " \
                 "(1) multiple choice or (2) likert-scale grid?"
             await message.channel.send(clarify_qs)
-            CLARIFYING_SURVEY = True
+            session.clarifying_survey = True
+
+        case 'PROFILE':
+            lower = message.content.lower()
+            if not profiling.is_admin(message.author):
+                await message.channel.send("Sorry, profiling is only available to bot admins.")
+            elif 'off' in lower:
+                session.profiling = session.profile_next = False
+                await message.channel.send("Profiling is off.")
+            elif 'next' in lower:
+                session.profile_next = True
+                await message.channel.send("I'll profile your next command.")
+            else:
+                session.profiling = True
+                await message.channel.send(
+                    "Profiling every command in this channel. Say 'autoscience, profile off' to stop."
+                )
 
-        case 'GET_QSF':
+        case 'GET_RESULTS':
+            survey_id = re.search(r'\bSV_\w+', message.content, re.IGNORECASE).group()
+            survey_id = "SV_" + survey_id[3:] # IDs are case-sensitive apart from the prefix
+            await message.channel.send(
+                f"Exporting responses for {survey_id} from Qualtrics. This can take a minute..."
+            )
             try:
+                report, count = await qualtrics_export.fetch_qualtrics_report(
+                    survey_id, session.path("survey_data", "qualtrics_report.pdf")
+                )
+            except qualtrics_export.QualtricsExportError as e:
+                await message.channel.send(f"❌ {e}")
+            else:
+                await send_file(message.channel, report, f"Here's the report for {count} Qualtrics response(s):")
+
+        case 'BATCH_SURVEYS':
+            # First line: the command (+ "likert" / "upload"); following lines: shared clarifications
+            command, _, info = message.content.partition('\n')
+            command = command.lower()
+            if not message.attachments:
                 await message.channel.send(
-                    "Here's the QSF file of the most recently-generated survey:",
-                    file=discord.File('qsf_files/generated_survey.qsf')
+                    "Please attach a .txt or .md file with one survey topic per line."
                 )
+                return
+            raw = await message.attachments[0].read()
+            topics = batch_surveys.parse_topics(raw.decode('utf-8', errors='replace'))
+            if not topics:
+                await message.channel.send("I couldn't find any topics in that file.")
+                return
+            if len(topics) > batch_surveys.MAX_TOPICS:
+                await message.channel.send(
+                    f"That's {len(topics)} topics; I can build up to {batch_surveys.MAX_TOPICS} at once."
+                )
+                return
+
+            likert = any(k in command for k in ('likert', 'grid'))
+            upload = any(k in command for k in ('upload', 'qualtrics'))
+            await message.channel.send(
+                f"Building {len(topics)} {'Likert-scale' if likert else 'multiple-choice'} surveys"
+                f"{' and uploading them to Qualtrics' if upload else ''}. This can take a few minutes..."
+            )
+            bundle, _, summary = await batch_surveys.run_batch(topics, info.strip(), likert, upload,
+                                                               session.path("survey_data", "batches"))
+            if len(summary) > 1990:
+                summary = summary[:1900] + "…\n(Full summary in summary.md inside the zip.)"
+            try:
+                await send_file(message.channel, bundle, summary)
+            finally:
+                os.remove(bundle) # Sent (or failed); the topics are cheap to rebuild
+
+        case 'GET_QSF':
+            try:
+                await send_file(message.channel, session.path("qsf_files", "generated_survey.qsf"),
+                                "Here's the QSF file of the most recently-generated survey:")
             except FileNotFoundError:
                 await message.channel.send("Oops! I couldn't find the QSF file.")
 
+        case 'EXPORT':
+            if not session.topic or not export.has_export(session.topic, session.workdir):
+                await message.channel.send("Oops! I haven't simulated any responses to export.")
+                return
+            bundle, count = await asyncio.to_thread(export.bundle_export, session.topic, None, session.workdir)
+            await send_file(
+                message.channel, bundle,
+                f"Here are the {count} simulated response(s) about {session.topic} "
+                f"as {export.FORMAT.upper()}, one row per respondent (see schema.json for the questions). "
+                "Load them with `export.load_export()` or any dataframe library."
+            )
+
         case 'GET_REPORT':
             try:
-                await message.channel.send(
-                    "Here's the report of the most recently-simulated survey:",
-                    file=discord.File('survey_data/report.pdf')
-                )
+                await send_file(message.channel, session.path("survey_data", "report.pdf"),
+                                "Here's the report of the most recently-simulated survey:")
             except FileNotFoundError:
                 await message.channel.send("Oops! I haven't simulated any surveys.")
 
         case 'GET_MD':
             try:
-                await message.channel.send(
-                    "Here's the MD file of the most recently-generated survey:",
-                    file=discord.File('md_files/generated_survey.md')
-                )
+                await send_file(message.channel, session.path("md_files", "generated_survey.md"),
+                                "Here's the MD file of the most recently-generated survey:")
             except FileNotFoundError:
                 await message.channel.send("Oops! I couldn't find the MD file.")
 
@@ -196,12 +451,14 @@ async def on_message(message: discord.Message):
                            if w == 'simulate' and i + 1 < len(parts)
                            and parts[i + 1].isdigit()), None)
             if number and number > 1:
-                AWAITING_SIM = True
+                session.awaiting_sim = True
                 await message.channel.send(
                     f"Compiling characters to simulate {number} survey responses."
                 )
-                outfile = create_character_list(CURR_SURVEY, TOPIC, number)
-                await message.channel.send(file=discord.File(outfile))
+                outfile = await asyncio.to_thread(create_survey.create_character_list,
+                                                  session.curr_survey, session.topic, number, session.workdir)
+                outputs.append(outfile)
+                await send_file(message.channel, outfile)
                 await message.channel.send(
                     "Would you like to edit the character list? If not, reply 'ok'."
                 )
@@ -209,17 +466,21 @@ async def on_message(message: discord.Message):
                 await message.channel.send(
                     "Generating a character to simulate one survey response..."
                 )
-                outfile = simulate_single_response(CURR_SURVEY, TOPIC)
-                await message.channel.send(file=discord.File(outfile))
+                outfile = await asyncio.to_thread(create_survey.simulate_single_response,
+                                                  session.curr_survey, session.topic, session.workdir)
+                outputs.append(outfile)
+                await send_file(message.channel, outfile)
 
         case 'GET_TOPIC':
-            await message.channel.send(f"The topic of the most-recent survey is **{TOPIC}**.")
+            await message.channel.send(f"The topic of the most-recent survey is **{session.topic}**.")
 
         case 'UPLOAD_QSF':
             await message.channel.send(
                 "Uploading your most recently-created survey to Qualtrics..."
             )
-            admin_url, preview_url = upload_to_qualtrics(TOPIC)
+            admin_url, preview_url = await asyncio.to_thread(
+                create_survey.upload_to_qualtrics, session.topic, session.path("qsf_files", "generated_survey.qsf")
+            )
             if admin_url:
                 await message.channel.send(
                     "Successfully imported into Qualtrics.\n"
@@ -241,7 +502,7 @@ async def on_message(message: discord.Message):
                 "I'm AutoScience, a bot that automates survey creation.\n"
                 "Here's a full list of my abilities…"
             )
-            await message.channel.send(file=discord.File('help.md'))
+            await send_file(message.channel, 'help.md')
 
         case 'UNKNOWN':
             await message.channel.send("I'm sorry, I'm not sure how to do that.")
@@ -249,4 +510,5 @@ async def on_message(message: discord.Message):
         case None:
             pass                                       # Non-bot chat – ignore silently
 # ────────────────────────────────────────────────
-client.run(TOKEN)
+if __name__ == '__main__':
+    client.run(TOKEN)
@@ -0,0 +1,281 @@
+import os, io, gzip, json, time, base64, atexit, hashlib, threading, contextvars
+from collections import defaultdict, deque
+from urllib.parse import urlsplit
+
+# ────────────────────────────────────────────────
+# Record / replay of external traffic.
+# CASSETTE_MODE=record writes every Gemini call, Qualtrics HTTP exchange and
+# message the bot acts on in a session, with timings, to CASSETTE_DIR/<session>.jsonl.gz.
+# CASSETTE_MODE=replay answers those calls from the cassette instead, after
+# the recorded delay or none (CASSETTE_LATENCY=zero). See replay.py to rerun a
+# whole session offline. The LLM cache is bypassed in both modes so every call
+# reaches the cassette.
+CASSETTE_MODE    = os.getenv("CASSETTE_MODE", "")  # "", "record" or "replay"
+CASSETTE_DIR     = os.getenv("CASSETTE_DIR", "cassettes")
+CASSETTE_LATENCY = os.getenv("CASSETTE_LATENCY", "recorded") # "recorded" or "zero"
+MAX_ATTACHMENT   = 1024 * 1024 # Larger attachments are recorded by name only
+TEXT_TYPES       = ("json", "text", "xml")
+# ────────────────────────────────────────────────
+
+SESSION = contextvars.ContextVar("cassette_session", default="global")
+
+class CassetteMiss(RuntimeError):
+    pass
+
+def active():
+    return CASSETTE_MODE in ("record", "replay")
+
+def use_session(key):
+    '''
+    Route this task's (and its worker threads') calls to `key`'s cassette
+    '''
+    return SESSION.set(str(key))
+
+def cassette_path(key):
+    return os.path.join(CASSETTE_DIR, f"{key}.jsonl.gz")
+
+def request_key(kind, *parts):
+    return kind + ":" + hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:32]
+
+# ───────── RECORDING ───────────────
+
+class Recorder:
+    '''
+    Appends entries to one session's cassette. Each write is gzip
+    sync-flushed, so a crash loses at most the entry being written.
+    '''
+
+    def __init__(self, key):
+        os.makedirs(CASSETTE_DIR, exist_ok=True)
+        self.file = gzip.open(cassette_path(key), 'ab')
+        self.lock = threading.Lock()
+        self.start = time.time()
+        self.messages = 0
+
+    def write(self, entry):
+        entry["t"] = round(time.time() - self.start, 4)
+        line = (json.dumps(entry, separators=(',', ':')) + "\n").encode('utf-8')
+        with self.lock:
+            self.file.write(line)
+            self.file.flush()
+
+_RECORDERS = {}
+_CASSETTES = {}
+_LOCK = threading.Lock()
+
+@atexit.register
+def _close_recorders():
+    for rec in _RECORDERS.values():
+        with rec.lock:
+            rec.file.close()
+
+def recorder():
+    key = SESSION.get()
+    with _LOCK:
+        if key not in _RECORDERS:
+            _RECORDERS[key] = Recorder(key)
+        return _RECORDERS[key]
+
+async def record_message(message, action=None):
+    '''
+    Record an incoming Discord message (and small attachments), with the
+    action it was taken as, so replay.py can send it again
+    Returns the message's number in the cassette (None when not recording),
+    for record_done()
+    '''
+    if CASSETTE_MODE != 'record':
+        return None
+    attachments = []
+    for attachment in getattr(message, 'attachments', []):
+        entry = {"filename": attachment.filename, "size": attachment.size}
+        if attachment.size <= MAX_ATTACHMENT:
+            entry["b64"] = base64.b64encode(await attachment.read()).decode('ascii')
+        attachments.append(entry)
+    rec = recorder()
+    with rec.lock:
+        seq, rec.messages = rec.messages, rec.messages + 1
+    rec.write({"kind": "message", "seq": seq, "action": action, "channel": message.channel.id,
+               "author": message.author.id, "content": message.content, "attachments": attachments})
+    return seq
+
+def record_done(seq):
+    '''
+    Mark message `seq` as handled, so replay knows which later messages
+    arrived while it was still running
+    '''
+    if CASSETTE_MODE == 'record' and seq is not None:
+        recorder().write({"kind": "done", "seq": seq})
+
+# ───────── REPLAY ───────────────
+
+def read_entries(path):
+    '''
+    Every complete entry in a cassette, including one still being recorded
+    (whose gzip stream has no end marker yet)
+    '''
+    entries = []
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        try:
+            for line in f:
+                if line.endswith("\n"):
+                    entries.append(json.loads(line))
+        except EOFError:
+            pass
+    return entries
+
+class Cassette:
+    '''
+    A loaded cassette: recorded responses queued per request key. Identical
+    requests are answered in recorded order; once a queue is down to its last
+    response, that response is repeated (e.g. extra progress polls). Each
+    message notes how many responses were recorded before it (`after`) and
+    which earlier messages had finished by then (`waits_for`); `served`
+    counts the responses handed out so far.
+    '''
+
+    def __init__(self, path):
+        self.messages = []
+        self.responses = defaultdict(deque)
+        recorded, done = 0, set()
+        for entry in read_entries(path):
+            if entry["kind"] == "message":
+                entry["after"] = recorded
+                # Cassettes without "done" entries replay one message at a time
+                entry["waits_for"] = set(done) if "seq" in entry else None
+                self.messages.append(entry)
+            elif entry["kind"] == "done":
+                done.add(entry["seq"])
+            else:
+                self.responses[entry["key"]].append(entry)
+                recorded += 1
+        self.served = 0
+        self.lock = threading.Lock()
+
+    def take(self, key, description):
+        with self.lock:
+            queue = self.responses.get(key)
+            if not queue:
+                raise CassetteMiss(f"No recorded response for {description} in session {SESSION.get()}")
+            entry = queue.popleft() if len(queue) > 1 else queue[0]
+        if CASSETTE_LATENCY != "zero":
+            time.sleep(entry["elapsed"])
+        with self.lock:
+            self.served += 1
+        return entry
+
+def cassette():
+    key = SESSION.get()
+    with _LOCK:
+        if key not in _CASSETTES:
+            try:
+                _CASSETTES[key] = Cassette(cassette_path(key))
+            except FileNotFoundError:
+                raise CassetteMiss(f"No cassette recorded for session {key} in {CASSETTE_DIR}") from None
+        return _CASSETTES[key]
+
+# ───────── GEMINI ───────────────
+
+def gemini(model, contents, call):
+    '''
+    `call()` sends the prompt and returns the response text; it is skipped
+    entirely in replay mode
+    '''
+    if not active():
+        return call()
+
+    key = request_key("gemini", model, contents)
+    if CASSETTE_MODE == 'replay':
+        return cassette().take(key, f"Gemini prompt {contents[:60]!r}")["text"]
+
+    start = time.perf_counter()
+    text = call()
+    recorder().write({"kind": "gemini", "key": key, "model": model, "prompt": contents,
+                      "text": text, "elapsed": round(time.perf_counter() - start, 4)})
+    return text
+
+# ───────── QUALTRICS HTTP ───────────────
+
+class ReplayResponse:
+    '''
+    The parts of requests.Response that the Qualtrics helpers use
+    '''
+
+    def __init__(self, entry):
+        from requests.structures import CaseInsensitiveDict
+        self.status_code = entry["status"]
+        self.url = entry["url"]
+        self.headers = CaseInsensitiveDict(entry["headers"])
+        self.content = (entry["body"].encode('utf-8') if "body" in entry
+                        else base64.b64decode(entry.get("b64", "")))
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        stream = io.BytesIO(self.content)
+        return iter(lambda: stream.read(chunk_size), b'')
+
+    def raise_for_status(self):
+        if not self.ok:
+            import requests
+            raise requests.HTTPError(f"{self.status_code} for url: {self.url}", response=self)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def request(method, url, **kwargs):
+    '''
+    requests.request, recorded or replayed. Uploaded files are matched by
+    file name only; JSON and form bodies are part of the match.
+    '''
+    import requests # Only loaded by commands that talk to Qualtrics
+    if not active():
+        return requests.request(method, url, **kwargs)
+
+    files = {name: os.path.basename(value[0]) if isinstance(value, tuple) else name
+             for name, value in (kwargs.get("files") or {}).items()}
+    # Matched on path + query, so a cassette replays against any data center / stub
+    target = urlsplit(url)._replace(scheme="", netloc="").geturl()
+    key = request_key("http", method.upper(), target, kwargs.get("json"), kwargs.get("data"), files)
+    if CASSETTE_MODE == 'replay':
+        return ReplayResponse(cassette().take(key, f"{method.upper()} {url}"))
+
+    start = time.perf_counter()
+    response = requests.request(method, url, **kwargs)
+    body = response.content # Buffers streamed downloads; recording is a debugging mode
+    entry = {"kind": "http", "key": key, "method": method.upper(), "url": url,
+             "status": response.status_code, "elapsed": round(time.perf_counter() - start, 4),
+             "headers": {k: v for k, v in response.headers.items() if k.lower() == 'content-type'}}
+    if any(t in response.headers.get('content-type', '') for t in TEXT_TYPES):
+        entry["body"] = body.decode('utf-8', errors='replace')
+    else:
+        entry["b64"] = base64.b64encode(body).decode('ascii')
+    recorder().write(entry)
+    return response
+
+class _HTTP:
+    '''
+    Drop-in for the `requests` functions used with Qualtrics
+    '''
+
+    def get(self, url, **kwargs):
+        return request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return request("POST", url, **kwargs)
+
+http = _HTTP()
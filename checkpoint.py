@@ -0,0 +1,103 @@
+import os, json
+from dataclasses import dataclass, field, asdict
+
+from state_backend import shared_backend
+
+# ────────────────────────────────────────────────
+# Durable session checkpoints.
+# Conversation state and the files each step produces are written to the
+# shared state backend (SQLite in WAL mode by default) in batches, and
+# restored lazily the first time a session is seen after a restart, so
+# redeploys don't throw away drafts or Gemini output. Every file a session
+# produces lives under SESSION_DIR/<key>/, so sessions never share outputs.
+SESSION_DIR = os.getenv("SESSION_DIR", "sessions")
+# ────────────────────────────────────────────────
+
+@dataclass
+class Session:
+    key: str
+    awaiting_survey: bool = False   # Expecting user approval on survey draft
+    clarifying_survey: bool = False # Expecting user to answer clarifying questions
+    awaiting_sim: bool = False      # Expecting user approval on generated simulation characters
+    sim_running: bool = False       # A live simulation is streaming results
+    resuming_sim: bool = False      # A restart cut a simulation short; expecting 'ok' to resume or 'cancel'
+    curr_survey: str = ""           # Store survey
+    topic: str = ""                 # Store survey topic
+    likert: bool = True             # Likert format or MC format
+    profiling: bool = False         # Admin turned on profiling for every command
+    profile_next: bool = False      # Admin asked to profile only the next command
+
+    # Not checkpointed
+    stop_sim: bool = field(default=False, compare=False)    # User asked to stop the live simulation early
+    interrupted: bool = field(default=False, compare=False) # A restart cut a simulation short
+
+    @property
+    def workdir(self):
+        return os.path.join(SESSION_DIR, self.key)
+
+    def path(self, *parts):
+        '''
+        `parts` joined under this session's directory, e.g. session.path("survey_data", "report.pdf")
+        '''
+        return os.path.join(self.workdir, *parts)
+
+    def state(self):
+        state = asdict(self)
+        del state['stop_sim'], state['interrupted']
+        return state
+
+# ────────────────────────────────────────────────
+STORE    = shared_backend()
+SESSIONS = {} # Sessions already restored in this process
+
+def get_session(key):
+    '''
+    Return the session for `key`, restoring it (and the files it produced)
+    from the checkpoint store on first use
+    '''
+    key = str(key)
+    if key in SESSIONS:
+        return SESSIONS[key]
+
+    state = STORE.load_session(key)
+    session = Session(**state) if state else Session(key=key)
+
+    if state:
+        # The store is authoritative: whatever is on disk may be another
+        # deploy's leftovers. Files saved before outputs were per session
+        # (outside the session's directory) are left alone.
+        workdir = os.path.abspath(session.workdir)
+        for name, content in STORE.load_stages(key).items():
+            if name.startswith('stage:') or os.path.commonpath([workdir, os.path.abspath(name)]) != workdir:
+                continue
+            os.makedirs(os.path.dirname(name) or ".", exist_ok=True)
+            with open(name, 'wb' if isinstance(content, bytes) else 'w') as f:
+                f.write(content)
+
+        # The process died mid-simulation; let the user pick it back up
+        if session.sim_running:
+            session.sim_running, session.resuming_sim, session.interrupted = False, True, True
+
+    SESSIONS[key] = session
+    return session
+
+def checkpoint(session, *paths):
+    '''
+    Record the session's state, plus the current contents of any files
+    that the last step wrote
+    '''
+    STORE.save_session(session.key, session.state())
+    for path in paths:
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                STORE.save_stage(session.key, path, f.read())
+
+def save_stage(session, name, value):
+    '''
+    Record an in-memory stage output (JSON-serialisable); None clears it
+    '''
+    STORE.save_stage(session.key, f"stage:{name}", None if value is None else json.dumps(value))
+
+def load_stage(session, name):
+    value = STORE.load_stage(session.key, f"stage:{name}")
+    return json.loads(value) if value is not None else None
@@ -1,27 +1,94 @@
 import os
+import re
 import sys
-import requests
 import json
-from google import genai
+import time
+import hashlib
+import threading
 from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+from state_backend import shared_backend
+import cassette
+
+# Load environment variables from .env file (a no-op if the entry point already did)
+if "GEMINI_API_KEY" not in os.environ:
+    load_dotenv()
 
 # ───────── SET UP QUALTRICS & GEMINI ───────────────
 
-# Gemini client
-CLIENT = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+# Gemini client, built on first use (google-genai is slow to import)
+CLIENT = None
+
+def gemini_client():
+    global CLIENT
+    if CLIENT is None:
+        from google import genai
+        CLIENT = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+    return CLIENT
 
 # If you store your token in an environment variable, you can read it here:
 QUALTRICS_TOKEN = os.getenv("QUALTRICS_TOKEN")
 
 DATA_CENTER = 'co1'  # e.g., "iad1", "ca1", "eu1", etc.
-BASE_URL = f'https://{DATA_CENTER}.qualtrics.com/API/v3'
+BASE_URL = os.getenv("QUALTRICS_BASE_URL", f'https://{DATA_CENTER}.qualtrics.com/API/v3') # Override to use qualtrics_stub.py
 HEADERS = {
     "x-api-token": QUALTRICS_TOKEN,
 }
 
+GEMINI_MODEL = "gemini-2.0-flash"
+
+# Per-minute budgets shared by every Gemini call / Qualtrics import in this
+# process (chat commands and batches alike); 0 turns a budget off
+GEMINI_RPM    = float(os.getenv("GEMINI_RPM", "60"))
+QUALTRICS_RPM = float(os.getenv("QUALTRICS_RPM", "30"))
+
+class RateBudget:
+    '''
+    Spaces calls evenly at `per_minute`; callers block until their slot.
+    Thread-safe. acquire() sleeps, so never call generate() or
+    upload_to_qualtrics() on the event loop; the bot runs them in threads.
+    '''
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            wait = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+GEMINI_BUDGET    = RateBudget(GEMINI_RPM)
+QUALTRICS_BUDGET = RateBudget(QUALTRICS_RPM)
+
+def generate(contents, cache=False):
+    '''
+    Send a prompt to Gemini and return the response text
+    With `cache`, identical prompts are answered from the shared LLM cache;
+    only use it for prompts that reformat content rather than create it
+    '''
+
+    key = None
+    if cache and not cassette.active(): # Recorded sessions must see every call
+        key = hashlib.sha256(f"{GEMINI_MODEL}\n{contents}".encode('utf-8')).hexdigest()
+        cached = shared_backend().cache_get(key)
+        if cached is not None:
+            return cached
+
+    def call():
+        GEMINI_BUDGET.acquire() # Only real calls count; cache hits and replays are free
+        return str(gemini_client().models.generate_content(model=GEMINI_MODEL, contents=contents).text)
+
+    text = cassette.gemini(GEMINI_MODEL, contents, call)
+
+    if key:
+        shared_backend().cache_put(key, text)
+    return text
+
 # ───────── SURVEY CONSTRUCTION FUNCTIONS ───────────────
 
 
@@ -347,11 +414,9 @@ def ideate_survey_mc(topic, info):
     user_message = "Create a 5-question survey about " + topic + " using the following clarifying information: " + info
     bot_message = user_message + " Return only the survey questions in your response, all of which should be multiple choice with letter options (do not use the all-of-the-above answer choice). Your response will be fed directly into a program."
 
-    response = CLIENT.models.generate_content(
-        model="gemini-2.0-flash", contents=bot_message
-    )
+    response_text = generate(bot_message)
 
-    return str(response.text)
+    return response_text
 
 def ideate_survey_likert(topic, info):
     '''
@@ -362,11 +427,9 @@ def ideate_survey_likert(topic, info):
     user_message = "Come up with 5 statements about " + topic + " for a Likert-scale grid survey using the following clarifying information: " + info
     bot_message = user_message + " Return only the statements in your response. Your response will be fed directly into a program."
 
-    response = CLIENT.models.generate_content(
-        model="gemini-2.0-flash", contents=bot_message
-    )
+    response_text = generate(bot_message)
 
-    out_text = "The possible responses for each statement are: Strongly Disagree, Disagree, Neutral, Agree, Strongly Agree.\n" + str(response.text)
+    out_text = "The possible responses for each statement are: Strongly Disagree, Disagree, Neutral, Agree, Strongly Agree.\n" + response_text
     return out_text
 
 def clarify_survey(topic): 
@@ -377,11 +440,9 @@ def clarify_survey(topic):
 
     message = "I was asked to create a survey about" + topic + ". Give me 2-4 clarifying questions about the survey content (e.g. Things to ask, clarify subject, etc) that I can ask the requestor."
 
-    response = CLIENT.models.generate_content(
-        model="gemini-2.0-flash", contents=message
-    )
+    response_text = generate(message)
 
-    return str(response.text)
+    return response_text
 
 def revise_survey(survey, revision):
     '''
@@ -392,11 +453,9 @@ def revise_survey(survey, revision):
     # here's the survey, here's the revision, please fix and return the survey 
     bot_message = "Here's a survey: " + survey + "\n Make the following revisions (but keep the survey multiple-choice with letter options). Return only the survey questions in your response as it will be fed directly into a program: " + revision
 
-    response = CLIENT.models.generate_content(
-        model="gemini-2.0-flash", contents=bot_message
-    )
+    response_text = generate(bot_message)
 
-    return str(response.text)
+    return response_text
 
 def create_likert_matrix_question_block(
         question_id: int,
@@ -464,15 +523,13 @@ def create_likert_matrix_question_block(
 
     return matrix_block
 
-def create_qsf_likert(survey_content, TOPIC):
+def create_qsf_likert(survey_content, TOPIC, output_filename="qsf_files/generated_survey.qsf"):
 
     bot_message = "Without making content changes, adapt the following list of statements to the following format, including quotations and separated by commas: \"I feel valued at work\", \"I have the resources I need\", \"My workload is manageable\"" + survey_content
 
-    response = CLIENT.models.generate_content(
-        model="gemini-2.0-flash", contents=bot_message
-    )
+    response_text = generate(bot_message, cache=True)
 
-    s = str(response.text)
+    s = response_text
     
     likert_q = create_likert_matrix_question_block(
     question_id=4,
@@ -487,44 +544,41 @@ def create_qsf_likert(survey_content, TOPIC):
     )
 
     questions = [likert_q]
-    create_qsf_file(questions, output_filename="qsf_files/generated_survey.qsf")
+    return create_qsf_file(questions, output_filename=output_filename)
 
 
-def create_qsf_mc(survey_content):
+def create_qsf_mc(survey_content, topic=None, output_filename="qsf_files/generated_survey.qsf"):
     
     bot_message = "Without making content changes, adapt the following survey to the following format (all features of the survey, including questions, are separated by pipe characters) of this example 3-question survey: '1|age|How old are you?|Under 18, 18-24, 25-34 | 2|favorite_fruit|Which of the following is your favorite fruit?|Apple, Banana, Orange, Strawberry | 3|transportation_mode|What is your primary mode of transportation?|Car, Bus, Train, Bike, Walk. |' The output will be structured to feed into a computer program, so do not add any additional text. Here's the survey: " + survey_content
 
-    response = CLIENT.models.generate_content(
-        model="gemini-2.0-flash", contents=bot_message
-    )
+    response_text = generate(bot_message, cache=True)
 
-    input_str = str(response.text)
+    input_str = response_text
     input_str = input_str[input_str.find("1|"):]
 
     question_counter, questions = create_short_survey_from_string(input_str)
 
-    generated_qsf_path = "qsf_files/generated_survey.qsf"
-    create_qsf_file(questions, survey_name="Auto Survey from Bot Message")
+    return create_qsf_file(questions, survey_name="Auto Survey from Bot Message", output_filename=output_filename)
 
 
-def upload_to_qualtrics(topic):
+def upload_to_qualtrics(topic, generated_qsf_path="qsf_files/generated_survey.qsf"):
     '''
     Upload existing QSF to Qualtrics
     '''
 
-    generated_qsf_path = "qsf_files/generated_survey.qsf"
     title = "Survey_" + topic.replace(" ", "_")
 
     # Endpoint for importing a QSF file
     import_url = f"{BASE_URL}/surveys"
 
     # Open the QSF file and post it to the API
+    QUALTRICS_BUDGET.acquire()
     with open(generated_qsf_path, 'rb') as file:
         files = {
             'file': (generated_qsf_path, file, 'application/vnd.qualtrics.survey.qsf')
         }
         data = {"name": title}
-        response = requests.post(import_url, headers=HEADERS, files=files, data=data)
+        response = cassette.http.post(import_url, headers=HEADERS, files=files, data=data)
 
     admin_url = ""
     preview_url = ""
@@ -544,126 +598,209 @@ def upload_to_qualtrics(topic):
 
     return admin_url, preview_url
 
-def simulate_single_response(survey_content, topic):
+def simulate_single_response(survey_content, topic, workdir="."):
     '''
     Simulate one survey response
     '''
     
     bot_message = "Pretend you are about to take this survey on " + topic + ". Give us a brief description about yourself and then give your responses to the following survey: " + survey_content
 
-    response = CLIENT.models.generate_content(
-        model="gemini-2.0-flash", contents=bot_message
-    )
+    response_text = generate(bot_message)
 
-    filename = f"md_files/simulated_responses/{topic.replace(" ", "_")}_survey_response.md"
+    os.makedirs(os.path.join(workdir, "md_files/simulated_responses"), exist_ok=True)
+    filename = os.path.join(workdir, f"md_files/simulated_responses/{topic.replace(" ", "_")}_survey_response.md")
 
     # Save the response text
     with open(filename, 'w', encoding='utf-8') as f:
-        f.write(response.text)
+        f.write(response_text)
 
     return filename
 
-def simulate_multiple_responses(survey_content, topic):
+# Top-level character markers, tried in order; only lines starting at column 0
+# count, so indented or bulleted field lines (`* **Age:** 34`) never do
+ENTRY_MARKERS = [
+    # "1. Maria", "**1. Maria Lopez**", "### 2) Maria", "Character 3: Maria"
+    re.compile(r"^(?:#{1,6}\s+|\*\*)?(?:\d+[.):]\s|(?:character|respondent|persona|profile)\s+\d+\b)", re.IGNORECASE),
+    re.compile(r"^#{1,6}\s"),           # Unnumbered headings
+    re.compile(r"^\*\*[^*:]+\*\*\s*$"),  # A bolded name on its own line (not "**Age:** 34")
+]
+
+def character_entries(characters):
+    '''
+    Split a generated character list into one string per character
+    Text before the first character (e.g. "Here are 5 characters:") is dropped
+    '''
+
+    lines = characters.strip().splitlines()
+    for marker in ENTRY_MARKERS:
+        starts = [i for i, line in enumerate(lines) if marker.match(line)]
+        if marker is ENTRY_MARKERS[1]:
+            # A lone title heading above the characters ("# Characters") isn't one of them
+            levels = [len(lines[i]) - len(lines[i].lstrip('#')) for i in starts]
+            starts = [i for i, level in zip(starts, levels) if level == max(levels)]
+        # One numbered character is still a list; other markers need two to be trusted
+        if len(starts) >= (1 if marker is ENTRY_MARKERS[0] else 2):
+            return ["\n".join(lines[a:b]).strip() for a, b in zip(starts, starts[1:] + [len(lines)])]
+
+    # Fall back to blank-line separated paragraphs if no markers were found
+    return [p.strip() for p in re.split(r"\n\s*\n", characters.strip()) if p.strip()]
+
+def split_character_list(characters, batch_size):
+    '''
+    Split a generated character list into batches of `batch_size` characters
+    Returns a list of strings, one per batch
+    '''
+
+    entries = character_entries(characters)
+    return ["\n".join(entries[i:i + batch_size]) for i in range(0, len(entries), batch_size)]
+
+def simulate_response_batch(survey_content, topic, characters):
+    '''
+    Simulate survey responses for the given characters
+    Returns the responses as a string
+    '''
+
+    bot_message = "Here is a survey about " + topic + "\n" + survey_content + "\n" ". Below, I have a list of characters that are to respond to the survey. For each character in the list, give the multiple-choice response AND a corresponding letter choice for each survey question, formatted nicely in a MD file. Only respond with the MD so that the response can be immediately used: " + characters
+
+    response_text = generate(bot_message)
+
+    return response_text
+
+def simulate_multiple_responses(survey_content, topic, workdir="."):
     '''
     Simulate multiple survey responses
     '''
 
-    file_path = f"md_files/simulated_characters/{topic.replace(" ", "_")}_characters.md"
+    file_path = os.path.join(workdir, f"md_files/simulated_characters/{topic.replace(" ", "_")}_characters.md")
     with open(file_path, 'r', encoding='utf-8') as f:
         characters = f.read()
-    
-    bot_message = "Here is a survey about " + topic + "\n" + survey_content + "\n" ". Below, I have a list of characters that are to respond to the survey. For each character in the list, give the multiple-choice response AND a corresponding letter choice for each survey question, formatted nicely in a MD file. Only respond with the MD so that the response can be immediately used: " + characters
 
-    response = CLIENT.models.generate_content(
-        model="gemini-2.0-flash", contents=bot_message
-    )
+    responses = simulate_response_batch(survey_content, topic, characters)
 
     # Ensure the output folder exists
-    os.makedirs("md_files/simulated_responses", exist_ok=True)
+    os.makedirs(os.path.join(workdir, "md_files/simulated_responses"), exist_ok=True)
 
     # Create a safe filename
-    filename = f"md_files/simulated_responses/{topic.replace(" ", "_")}_survey_responses_batch.md"
+    filename = os.path.join(workdir, f"md_files/simulated_responses/{topic.replace(" ", "_")}_survey_responses_batch.md")
 
     # Save the response text
     with open(filename, 'w', encoding='utf-8') as f:
-        f.write(response.text)
+        f.write(responses)
 
     return filename
 
-def extract_data(survey_content, topic):
-
-    # read survey responses
-    filename = f"md_files/simulated_responses/{topic.replace(" ", "_")}_survey_responses_batch.md"
-    with open(filename, 'r', encoding='utf-8') as f:
-        survey_simulations = f.read()
+def extract_survey_structure(survey_content, workdir="."):
+    '''
+    Convert the survey into the parseable `<workdir>/survey_data/survey.md` format
+    Returns the structure as a string
+    '''
 
-    # write extractable survey info
     bot_message = "Here is a survey: " + survey_content + "\nRespond only with text that can be fed into a function, representing the survey using the following format: "
     bot_message += "1 Insert First Question Text; a. Option 1; b. Option 2; c. Option 3 | 2 Insert Second Question Text; a. Option 1; b. Option 2; c. Option 3 |"
 
-    response = CLIENT.models.generate_content(
-        model="gemini-2.0-flash", contents=bot_message
-    )
+    response_text = generate(bot_message, cache=True)
 
     # Ensure the output folder exists
-    os.makedirs("survey_data", exist_ok=True)
+    os.makedirs(os.path.join(workdir, "survey_data"), exist_ok=True)
 
-    filename = f"survey_data/survey.md"
+    filename = os.path.join(workdir, "survey_data/survey.md")
     with open(filename, 'w', encoding='utf-8') as f:
-        f.write(response.text)
+        f.write(response_text)
+
+    return response_text
+
+def extract_response_codes(survey_simulations):
+    '''
+    Convert simulated responses into letter codes, e.g. "a,b,b | b,a,a |"
+    Returns the codes as a string
+    '''
 
-    # write extractable response info
     bot_message = "Here are the results of survey: " + survey_simulations + "\nRespond only with text that can be fed into a function, representing each respondent's answers in the following format: "
     bot_message += "a,b,b,c,b | b,a,a,a,c | c,b,a,d,a |"
 
-    response = CLIENT.models.generate_content(
-        model="gemini-2.0-flash", contents=bot_message
-    )
+    response_text = generate(bot_message)
+
+    return response_text
+
+def extract_data(survey_content, topic, workdir="."):
+
+    # read survey responses
+    filename = os.path.join(workdir, f"md_files/simulated_responses/{topic.replace(" ", "_")}_survey_responses_batch.md")
+    with open(filename, 'r', encoding='utf-8') as f:
+        survey_simulations = f.read()
+
+    # write extractable survey info
+    extract_survey_structure(survey_content, workdir)
+
+    # write extractable response info
+    filename = os.path.join(workdir, "survey_data/responses.md")
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write(extract_response_codes(survey_simulations))
+    # Respondents here are matched to personas by position, not by a live run's map
+    respondents = os.path.join(workdir, "survey_data/respondents.json")
+    if os.path.exists(respondents):
+        os.remove(respondents)
+
+def extract_persona_attributes(topic, workdir="."):
+    '''
+    Pull structured attributes out of the character list for demographic breakdowns
+    Writes and returns `<workdir>/survey_data/personas.md`
+    '''
+
+    file_path = os.path.join(workdir, f"md_files/simulated_characters/{topic.replace(" ", "_")}_characters.md")
+    with open(file_path, 'r', encoding='utf-8') as f:
+        characters = f.read()
+
+    bot_message = "Here is a list of survey respondents: " + characters + "\nRespond only with text that can be fed into a function, listing each respondent in the same order using the fields name, age (a number), gender, nation, occupation in the following format: "
+    bot_message += "Maria Lopez,34,Female,Mexico,Nurse | James Chen,21,Male,United States,Student |"
+
+    response_text = generate(bot_message)
+
+    # Ensure the output folder exists
+    os.makedirs(os.path.join(workdir, "survey_data"), exist_ok=True)
 
-    filename = f"survey_data/responses.md"
+    filename = os.path.join(workdir, "survey_data/personas.md")
     with open(filename, 'w', encoding='utf-8') as f:
-        f.write(response.text)
+        f.write(response_text)
+
+    return filename
 
-def create_character_list(survey_content, topic, num):
+def create_character_list(survey_content, topic, num, workdir="."):
     '''
     Create and return a list of characters to simulate survey responses
     '''
 
     bot_message = "Copied below is a survey on " + topic + ". Come up with " + str(num) + " characters to take the survey. For now, for each character, give a quick description, including their name, age, nation of origin, demographic information. Respond only with the character list as your response will feed into text output." + survey_content
 
-    response = CLIENT.models.generate_content(
-        model="gemini-2.0-flash", contents=bot_message
-    )
+    response_text = generate(bot_message)
 
     # Ensure the output folder exists
-    os.makedirs("md_files/simulated_characters", exist_ok=True)
+    os.makedirs(os.path.join(workdir, "md_files/simulated_characters"), exist_ok=True)
 
     # Create a safe filename
-    filename = f"md_files/simulated_characters/{topic.replace(" ", "_")}_characters.md"
+    filename = os.path.join(workdir, f"md_files/simulated_characters/{topic.replace(" ", "_")}_characters.md")
 
     # Save the response text
     with open(filename, 'w', encoding='utf-8') as f:
-        f.write(response.text)
+        f.write(response_text)
 
     return filename
 
-def revise_character_list(revision, topic):
+def revise_character_list(revision, topic, workdir="."):
     '''
     Make any changes to list of simulated characters
     '''
 
-    file_path = f"md_files/simulated_characters/{topic.replace(" ", "_")}_characters.md"
+    file_path = os.path.join(workdir, f"md_files/simulated_characters/{topic.replace(" ", "_")}_characters.md")
     with open(file_path, 'r', encoding='utf-8') as f:
         content = f.read()
 
     bot_message = "Copied below is a list of made-up respondent profiles for a survey about " + topic + "\n" + content + "\n" ". Revise the list of profiles based on the following feedback. Respond only with the character list as your response will feed into text output: " + revision
 
-    response = CLIENT.models.generate_content(
-        model="gemini-2.0-flash", contents=bot_message
-    )
+    response_text = generate(bot_message)
 
     # Save the response text
     with open(file_path, 'w', encoding='utf-8') as f:
-        f.write(response.text)
+        f.write(response_text)
 
     return file_path
@@ -0,0 +1,142 @@
+import os, gzip, shutil, asyncio, hashlib, tempfile, discord
+from startup import lazy_import
+
+report_cache = lazy_import("report_cache") # fpdf / PIL, only needed to shrink reports
+
+# ────────────────────────────────────────────────
+# Size-aware attachment delivery.
+# A file over the channel's upload limit is, in order: rebuilt smaller (raster
+# report PDFs, from their cached pages), gzip-compressed, split into numbered parts,
+# and only then stored as an artifact and sent as a link. Compression and
+# splitting stream through CHUNK_SIZE buffers, never the whole file.
+FILE_LIMIT        = os.getenv("DISCORD_FILE_LIMIT") # Bytes; overrides the server's own limit
+DEFAULT_LIMIT     = 10 * 1024 * 1024                # Discord's limit for DMs / unboosted servers
+HEADROOM          = 64 * 1024  # Room for the multipart envelope
+CHUNK_SIZE        = 1024 * 1024
+MAX_PARTS         = 8          # More parts than this and a link is friendlier
+PDF_SCALES        = (0.75, 0.5, 0.35)
+ARTIFACT_DIR      = os.getenv("ARTIFACT_DIR", "artifacts")
+ARTIFACT_BASE_URL = os.getenv("ARTIFACT_BASE_URL", "") # Public URL that serves ARTIFACT_DIR
+# Formats that are already compressed; gzip would only cost time
+COMPRESSED_EXTS   = {'.pdf', '.png', '.jpg', '.jpeg', '.zip', '.gz', '.parquet'}
+# ────────────────────────────────────────────────
+
+def upload_limit(channel):
+    if FILE_LIMIT:
+        limit = int(FILE_LIMIT)
+    else:
+        guild = getattr(channel, 'guild', None) # None in DMs
+        limit = guild.filesize_limit if guild is not None else DEFAULT_LIMIT
+    return max(limit - HEADROOM, limit // 2)
+
+def gzip_file(path, output):
+    with open(path, 'rb') as src, gzip.open(output, 'wb', compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst, CHUNK_SIZE)
+    return output
+
+def split_file(path, part_size, prefix):
+    '''
+    Cut `path` into `prefix.001`, `prefix.002`... of at most `part_size` bytes
+    Returns the part paths
+    '''
+    parts = []
+    with open(path, 'rb') as src:
+        while True:
+            part = f"{prefix}.{len(parts) + 1:03d}"
+            written = 0
+            with open(part, 'wb') as dst:
+                while written < part_size:
+                    chunk = src.read(min(CHUNK_SIZE, part_size - written))
+                    if not chunk:
+                        break
+                    dst.write(chunk)
+                    written += len(chunk)
+            if not written:
+                os.remove(part)
+                return parts
+            parts.append(part)
+
+def store_artifact(path, filename):
+    '''
+    Copy `path` into ARTIFACT_DIR under a content-addressed name
+    Returns the stored path
+    '''
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    name = f"{digest.hexdigest()[:16]}_{filename}"
+    os.makedirs(ARTIFACT_DIR, exist_ok=True)
+    stored = os.path.join(ARTIFACT_DIR, name)
+    if not os.path.exists(stored):
+        shutil.copyfile(path, stored)
+    return stored
+
+def with_note(content, note):
+    return f"{content}\n{note}" if content else note
+
+async def send_file(channel, path, content=None, filename=None):
+    '''
+    Send `path` to `channel`, shrinking, compressing or splitting it if it is
+    over the upload limit. Raises FileNotFoundError if `path` doesn't exist.
+    '''
+    filename = filename or os.path.basename(path)
+    size, limit = os.path.getsize(path), upload_limit(channel)
+
+    if size <= limit:
+        try:
+            await channel.send(content, file=discord.File(path, filename=filename))
+            return
+        except discord.HTTPException as e:
+            if e.status != 413: # Payload too large: our limit was optimistic
+                raise
+            limit = min(limit, size - 1)
+
+    ext = os.path.splitext(filename)[1].lower()
+    with tempfile.TemporaryDirectory(prefix="autoscience-delivery-") as tmpdir:
+        # 1. Raster report PDFs: rebuild from the cached pages at lower resolution
+        if ext == '.pdf':
+            for scale in PDF_SCALES:
+                small = await asyncio.to_thread(report_cache.downsample_pdf, path, scale,
+                                                output=os.path.join(tmpdir, f"{scale}.pdf"))
+                if small is None:
+                    break
+                if os.path.getsize(small) <= limit:
+                    note = f"(Images reduced to {int(scale * 100)}% to fit Discord's upload limit.)"
+                    await channel.send(with_note(content, note),
+                                       file=discord.File(small, filename=filename))
+                    return
+
+        # 2. Compress
+        payload, payload_name = path, filename
+        if ext not in COMPRESSED_EXTS:
+            payload_name = f"{filename}.gz"
+            payload = await asyncio.to_thread(gzip_file, path, os.path.join(tmpdir, payload_name))
+            if os.path.getsize(payload) >= size: # Nothing gained; split the original instead
+                payload, payload_name = path, filename
+            elif os.path.getsize(payload) <= limit:
+                note = "(Compressed to fit Discord's upload limit; open with any unzip tool.)"
+                await channel.send(with_note(content, note),
+                                   file=discord.File(payload, filename=payload_name))
+                return
+
+        # 3. Split into parts
+        if -(-os.path.getsize(payload) // limit) <= MAX_PARTS:
+            parts = await asyncio.to_thread(split_file, payload, limit, os.path.join(tmpdir, payload_name))
+            note = (f"(Too large for one upload, so it's split into {len(parts)} parts. "
+                    f"Rejoin with `cat {payload_name}.0* > {payload_name}`.)")
+            await channel.send(with_note(content, note))
+            for part in parts:
+                await channel.send(file=discord.File(part, filename=os.path.basename(part)))
+            return
+
+    # 4. Last resort: a stored copy, linked if ARTIFACT_DIR is served
+    stored = await asyncio.to_thread(store_artifact, path, filename)
+    note = f"{filename} is too large to attach ({size / 1024 / 1024:.1f} MB)."
+    if ARTIFACT_BASE_URL:
+        note += f" It's available at: {ARTIFACT_BASE_URL.rstrip('/')}/{os.path.basename(stored)}"
+    else:
+        # Server paths are for the operator, not the channel
+        print(f"[WARN] Couldn't deliver {filename} to channel {channel.id}; stored at {os.path.abspath(stored)}")
+        note += " I couldn't deliver it here; ask the bot's operator for a copy."
+    await channel.send(with_note(content, note))
@@ -1,14 +1,26 @@
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_pdf import PdfPages
+# Figures are built without pyplot, whose global figure registry isn't
+# thread-safe; reports and tallies render concurrently in worker threads
+from matplotlib import colormaps, ticker
+from matplotlib.figure import Figure
+import os
+import json
 import textwrap
 
+import report_cache
+import analytics
+import likert
+
 def parse_survey(filename):
 
     with open(filename, 'r') as f:
         raw = f.read().strip()
 
+    return parse_survey_string(raw)
+
+def parse_survey_string(raw):
+
     questions = []
-    for q_raw in raw.split(' | '):
+    for q_raw in raw.strip().rstrip('|').strip().split(' | '):
         parts = q_raw.split(';')
         q_text = parts[0].strip()
         choices = [opt.strip().split('. ', 1)[1] for opt in parts[1:]]
@@ -19,56 +31,195 @@ def parse_responses(filename):
     with open(filename, 'r') as f:
         raw = f.read().strip()
 
-    response_lines = [line.strip().split(',') for line in raw.split(' | ')]
+    return parse_response_string(raw)
+
+def parse_response_string(raw):
+    # "a,b,c | b,a,a |" -> [['a','b','c'], ['b','a','a']]
+    response_lines = []
+    for line in raw.strip().split('|'):
+        codes = [code.strip().lower() for code in line.split(',')]
+        if any(codes):
+            response_lines.append(codes)
     return response_lines
 
 def tally_responses(questions, response_lines):
     tally = [dict() for _ in questions]
+    update_tally(tally, response_lines)
+    return tally
+
+def update_tally(tally, response_lines):
+    # Fold new respondents into an existing tally (in place)
     for line in response_lines:
-        for i, response in enumerate(line):
+        for i, response in enumerate(line[:len(tally)]):
             tally[i][response] = tally[i].get(response, 0) + 1
     return tally
 
-def generate_pdf_report(questions, tally):
-
-    filename="survey_data/report.pdf"
-
-    with PdfPages(filename) as pdf:
-        for i, ((q_text, choices), response_counts) in enumerate(zip(questions, tally)):
-            labels = [chr(ord('a') + j) for j in range(len(choices))]
-            counts = [response_counts.get(l, 0) for l in labels]
-
-            # Wrap long labels
-            wrapped_choices = ['\n'.join(textwrap.wrap(choice, width=30)) for choice in choices]
-
-            # Create a letter-sized page
-            fig, ax = plt.subplots(figsize=(8.5, 11))  # US letter
-
-            # Plot the bar chart
-            ax.bar(wrapped_choices, counts)
-            ax.set_title(f"Q{i+1}: {q_text}", fontsize=13, wrap=True, pad=20)
-            ax.set_ylabel("Number of Responses", fontsize=11)
-            ax.tick_params(axis='x', labelrotation=30, labelsize=11)
-            ax.tick_params(axis='y', labelsize=11)
-
-            # Adjust layout: occupy top half of the page
-            plt.subplots_adjust(
-                top=0.85,     # raise top of the chart
-                bottom=0.55,  # raise bottom margin (move chart up)
-                left=0.15,
-                right=0.9
-            )
-
-            pdf.savefig(fig)
-            plt.close()
+def summarize_tally(questions, tally, respondents):
+
+    lines = [f"**Live results — {respondents} respondent(s) so far**"]
+    for i, ((q_text, choices), response_counts) in enumerate(zip(questions, tally)):
+        labels = [chr(ord('a') + j) for j in range(len(choices))]
+        counts = " · ".join(f"{l}) {response_counts.get(l, 0)}" for l in labels)
+        lines.append(f"Q{i+1}: {textwrap.shorten(q_text, width=60)} — {counts}")
+
+    # Discord caps messages at 2000 characters
+    summary = "\n".join(lines)
+    return summary if len(summary) <= 1990 else summary[:1989] + "…"
+
+def render_tally_chart(questions, tally, filename="survey_data/live_tally.png"):
+
+    n = max(len(questions), 1)
+    cols = 2 if n > 1 else 1
+    rows = (n + cols - 1) // cols
+    fig = Figure(figsize=(4 * cols, 2 * rows))
+    axes = fig.subplots(rows, cols, squeeze=False)
+
+    for i, ax in enumerate(axes.flat):
+        if i >= len(questions):
+            ax.axis('off')
+            continue
+        choices = questions[i][1]
+        labels = [chr(ord('a') + j) for j in range(len(choices))]
+        ax.barh(labels[::-1], [tally[i].get(l, 0) for l in labels[::-1]])
+        ax.set_title(f"Q{i+1}", fontsize=9)
+        ax.tick_params(labelsize=8)
+
+    fig.tight_layout()
+    fig.savefig(filename, dpi=80)
+    return filename
+
+# Bump whenever the page layout below changes so cached pages are re-rendered
+REPORT_STYLE = {"version": 1, "figsize": (8.5, 11), "dpi": report_cache.PAGE_DPI}
+
+def render_question_page(i, q_text, choices, response_counts):
+    labels = [chr(ord('a') + j) for j in range(len(choices))]
+    counts = [response_counts.get(l, 0) for l in labels]
+
+    # Wrap long labels
+    wrapped_choices = ['\n'.join(textwrap.wrap(choice, width=30)) for choice in choices]
+
+    # Create a letter-sized page
+    fig = Figure(figsize=(8.5, 11))  # US letter
+    ax = fig.subplots()
+
+    # Plot the bar chart
+    ax.bar(wrapped_choices, counts)
+    ax.set_title(f"Q{i+1}: {q_text}", fontsize=13, wrap=True, pad=20)
+    ax.set_ylabel("Number of Responses", fontsize=11)
+    ax.tick_params(axis='x', labelrotation=30, labelsize=11)
+    ax.tick_params(axis='y', labelsize=11)
+
+    # Adjust layout: occupy top half of the page
+    fig.subplots_adjust(
+        top=0.85,     # raise top of the chart
+        bottom=0.55,  # raise bottom margin (move chart up)
+        left=0.15,
+        right=0.9
+    )
+    return fig
+
+def render_breakdown_page(i, q_text, choices, tables):
+    # One 100%-stacked bar chart per demographic dimension
+    fig = Figure(figsize=(8.5, 11))
+    axes = fig.subplots(len(tables), 1, squeeze=False)
+    fig.suptitle(f"Q{i+1} by respondent profile: {textwrap.shorten(q_text, width=80)}", fontsize=12)
+
+    for ax, (dim, table) in zip(axes.flat, tables):
+        left = [0.0] * len(table)
+        for j, choice in enumerate(choices):
+            shares = table[choice].tolist()
+            ax.barh(table.index.astype(str), shares, left=left,
+                    label=textwrap.shorten(choice, width=25), color=colormaps['tab10'](j % 10))
+            left = [l + v for l, v in zip(left, shares)]
+        ax.set_title(dim.replace('_', ' ').title(), fontsize=10)
+        ax.set_xlim(0, 1)
+        ax.xaxis.set_major_formatter(ticker.PercentFormatter(1.0))
+        ax.tick_params(labelsize=8)
+        ax.invert_yaxis()
+
+    handles, labels = axes.flat[0].get_legend_handles_labels()
+    fig.legend(handles, labels, loc='lower center', ncol=min(len(choices), 3), fontsize=8)
+    fig.subplots_adjust(top=0.92, bottom=0.12, left=0.25, right=0.95, hspace=0.5)
+    return fig
+
+def likert_pages(questions, stats):
+    # Statements share one scale; take its labels from the first statement
+    scale = questions[0][1] if questions and len(questions[0][1]) > 1 else likert.SCALE
+    statements = [q_text for q_text, _ in questions]
+
+    pages = []
+    for first in range(0, len(statements), likert.STATEMENTS_PER_PAGE):
+        last = first + likert.STATEMENTS_PER_PAGE
+        chunk = {name: values[first:last] for name, values in stats.items()}
+        key = report_cache.page_key("likert", REPORT_STYLE, first, statements[first:last], scale,
+                                    chunk["distribution"].tolist())
+        pages.append(report_cache.cached_page(
+            key, lambda s=statements[first:last], c=chunk, f=first: likert.render_likert_page(s, c, scale, f)
+        ))
+    return pages
+
+def generate_pdf_report(questions, tally, filename="survey_data/report.pdf", cube=None, likert_stats=None):
+
+    breakdown_dims = analytics.breakdown_dimensions(cube) if cube else []
+
+    # Only pages whose question, choices or counts changed are re-rendered
+    pages = likert_pages(questions, likert_stats) if likert_stats is not None else []
+    for i, ((q_text, choices), response_counts) in enumerate(zip(questions, tally)):
+        labels = [chr(ord('a') + j) for j in range(len(choices))]
+        counts = [response_counts.get(l, 0) for l in labels]
+        key = report_cache.page_key("question", REPORT_STYLE, i, q_text, choices, counts)
+        pages.append(report_cache.cached_page(
+            key, lambda i=i, q=q_text, c=choices, r=response_counts: render_question_page(i, q, c, r)
+        ))
+
+        # Demographic breakdown page, sliced straight out of the cube
+        tables = [(dim, analytics.crosstab(cube, dim, i, normalize=True)) for dim in breakdown_dims]
+        tables = [(dim, table) for dim, table in tables if len(table) > 1]
+        if tables:
+            key = report_cache.page_key("breakdown", REPORT_STYLE, i, q_text, choices,
+                                        [(dim, table.round(4).to_dict('split')) for dim, table in tables])
+            pages.append(report_cache.cached_page(
+                key, lambda i=i, q=q_text, c=choices, t=tables: render_breakdown_page(i, q, c, t)
+            ))
+
+    report_cache.assemble_pdf(pages, filename)
+    report_cache.prune()
+    return filename
 
 # Entrypoint 
-def process_data():
+def process_data(is_likert=False, workdir="."):
 
-    survey_file = "survey_data/survey.md"
-    responses_file = "survey_data/responses.md"
+    survey_file = os.path.join(workdir, "survey_data/survey.md")
+    responses_file = os.path.join(workdir, "survey_data/responses.md")
+    personas_file = os.path.join(workdir, "survey_data/personas.md")
+    respondents_file = os.path.join(workdir, "survey_data/respondents.json") # Which character each respondent is (live simulation)
 
     questions = parse_survey(survey_file)
     responses = parse_responses(responses_file)
     tally = tally_responses(questions, responses)
-    generate_pdf_report(questions, tally)
\ No newline at end of file
+
+    persona_index, n_characters = None, len(responses)
+    if os.path.exists(respondents_file):
+        with open(respondents_file, 'r') as f:
+            respondents = json.load(f)
+        persona_index, n_characters = respondents["personas"], respondents["characters"]
+
+    cube = None
+    if os.path.exists(personas_file):
+        with open(personas_file, 'r') as f:
+            personas = analytics.parse_personas(f.read())
+        # A persona list that doesn't line up with the characters would mislabel everyone
+        if len(personas) == n_characters:
+            frame = analytics.build_response_frame(questions, responses, personas, persona_index)
+            cube = analytics.build_cube(frame, questions)
+        else:
+            print(f"[WARN] {len(personas)} personas for {n_characters} characters; skipping demographic breakdowns")
+
+    likert_stats = None
+    if is_likert and questions:
+        n_points = len(questions[0][1]) if len(questions[0][1]) > 1 else len(likert.SCALE)
+        matrix = likert.encode_likert(responses, len(questions), n_points)
+        likert_stats = likert.likert_statistics(matrix, n_points)
+
+    return generate_pdf_report(questions, tally, os.path.join(workdir, "survey_data/report.pdf"),
+                               cube=cube, likert_stats=likert_stats)
\ No newline at end of file
@@ -0,0 +1,157 @@
+import os, re, json, shutil, zipfile, tempfile
+import pandas as pd
+
+import analytics
+
+# ────────────────────────────────────────────────
+# Columnar export of simulated responses.
+# One row per respondent: persona attributes plus one int8 answer code per
+# question (0 = "a", 1 = "b"..., -1 = missing). Each simulation batch is
+# appended as its own part file, named by the first respondent it holds, so a
+# resumed run rewrites nothing. Parquet (pyarrow) by default; EXPORT_FORMAT=csv
+# writes gzip CSV instead, with the dtypes recorded in schema.json. Exports
+# live in the session's own directory (see checkpoint.Session.workdir).
+EXPORT_DIR = "survey_data/export"
+FORMAT     = os.getenv("EXPORT_FORMAT", "parquet")
+EXTENSIONS = {"parquet": ".parquet", "csv": ".csv.gz"}
+SCHEMA     = "schema.json"
+# ────────────────────────────────────────────────
+
+if FORMAT not in EXTENSIONS:
+    raise ValueError(f"EXPORT_FORMAT must be one of {', '.join(EXTENSIONS)}, not {FORMAT!r}")
+
+def export_dir(topic, workdir="."):
+    return os.path.join(workdir, EXPORT_DIR, re.sub(r'[^\w-]+', '_', topic).strip('_') or "survey")
+
+def has_export(topic, workdir="."):
+    return os.path.exists(os.path.join(export_dir(topic, workdir), SCHEMA))
+
+def column_types(questions):
+    types = {"respondent": "int32", "name": "string", "age": "Int16"}
+    types.update({dim: "category" for dim in analytics.DIMENSIONS})
+    types.update({f"Q{i+1}": "int8" for i in range(len(questions))})
+    return types
+
+def start_export(topic, questions, workdir="."):
+    '''
+    Clear any previous export for `topic` and record its schema
+    '''
+    directory = export_dir(topic, workdir)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+    schema = {
+        "topic": topic,
+        "format": FORMAT,
+        "columns": column_types(questions),
+        "age_groups": analytics.AGE_LABELS + [analytics.UNKNOWN],
+        "questions": [{"id": f"Q{i+1}", "text": text, "options": choices}
+                      for i, (text, choices) in enumerate(questions)],
+    }
+    with open(os.path.join(directory, SCHEMA), 'w', encoding='utf-8') as f:
+        json.dump(schema, f, indent=2)
+    return directory
+
+def read_personas(filename="survey_data/personas.md"):
+    try:
+        with open(filename, 'r', encoding='utf-8') as f:
+            return analytics.parse_personas(f.read())
+    except FileNotFoundError:
+        return None
+
+def respondent_frame(questions, response_lines, personas=None, offset=0, persona_index=None):
+    '''
+    Typed frame for respondents offset .. offset + len(response_lines);
+    `persona_index` as in analytics.match_personas (default: by position)
+    '''
+    n = len(response_lines)
+    if persona_index is None:
+        persona_index = range(offset, offset + n)
+    personas = analytics.match_personas(personas, n, persona_index)
+    frame = analytics.build_response_frame(questions, response_lines, personas)
+
+    ages = pd.to_numeric(personas["age"].astype(str).str.extract(r"(\d+)")[0], errors='coerce')
+    frame.insert(0, "respondent", pd.RangeIndex(offset, offset + n))
+    frame.insert(1, "name", personas["name"].astype("string").str.strip().replace("", pd.NA))
+    frame.insert(2, "age", ages)
+    return frame.astype({column: dtype for column, dtype in column_types(questions).items()
+                         if dtype != "category"})
+
+def write_part(topic, questions, response_lines, personas=None, offset=0, persona_index=None, workdir="."):
+    '''
+    Append one batch of respondents as a new part file
+    Returns the part's path
+    '''
+    directory = export_dir(topic, workdir)
+    if not has_export(topic, workdir):
+        start_export(topic, questions, workdir)
+    frame = respondent_frame(questions, response_lines, personas, offset, persona_index)
+
+    path = os.path.join(directory, f"part-{offset:06d}{EXTENSIONS[FORMAT]}")
+    tmp = f"{path}.{os.getpid()}.tmp"
+    if FORMAT == "parquet":
+        frame.to_parquet(tmp, index=False, compression='zstd')
+    else:
+        frame.to_csv(tmp, index=False, compression='gzip')
+    os.replace(tmp, path)
+    return path
+
+def load_export(path):
+    '''
+    Load an export directory (or a bundle zip from `autoscience, export`)
+    into one typed DataFrame, ordered by respondent
+    '''
+    if path.endswith(".zip"):
+        with tempfile.TemporaryDirectory(prefix="autoscience-export-") as tmpdir:
+            with zipfile.ZipFile(path) as z:
+                z.extractall(tmpdir)
+            return load_export(tmpdir)
+
+    with open(os.path.join(path, SCHEMA), 'r', encoding='utf-8') as f:
+        schema = json.load(f)
+    columns, extension = schema["columns"], EXTENSIONS[schema["format"]]
+    parts = sorted(name for name in os.listdir(path) if name.endswith(extension))
+
+    if schema["format"] == "parquet":
+        frames = [pd.read_parquet(os.path.join(path, name)) for name in parts]
+    else:
+        dtypes = {column: ("string" if dtype == "category" else dtype) for column, dtype in columns.items()}
+        frames = [pd.read_csv(os.path.join(path, name), dtype=dtypes, keep_default_na=False,
+                              na_values={"name": [""], "age": [""]}) for name in parts]
+    if not frames:
+        return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in columns.items()})
+
+    # Categories differ between parts, so they are rebuilt over the whole export
+    frame = pd.concat(frames, ignore_index=True).sort_values("respondent", ignore_index=True)
+    for column, dtype in columns.items():
+        if column == "age_group":
+            frame[column] = pd.Categorical(frame[column], categories=schema["age_groups"], ordered=True)
+        elif dtype == "category":
+            frame[column] = frame[column].astype("string").astype("category")
+        else:
+            frame[column] = frame[column].astype(dtype)
+    return frame
+
+def bundle_export(topic, filename=None, workdir="."):
+    '''
+    Consolidate every part into a single file and zip it with the schema
+    Returns (zip path, number of respondents)
+    '''
+    directory = export_dir(topic, workdir)
+    frame = load_export(directory)
+    filename = filename or f"{directory}_responses.zip"
+
+    with tempfile.TemporaryDirectory(prefix="autoscience-export-") as tmpdir:
+        data = os.path.join(tmpdir, f"responses{EXTENSIONS[FORMAT]}")
+        if FORMAT == "parquet":
+            frame.to_parquet(data, index=False, compression='zstd')
+        else:
+            frame.to_csv(data, index=False, compression='gzip')
+        with open(os.path.join(directory, SCHEMA), 'r', encoding='utf-8') as f:
+            schema = json.load(f)
+        schema["format"] = FORMAT
+
+        # Already compressed; store as-is
+        with zipfile.ZipFile(filename, 'w', compression=zipfile.ZIP_STORED) as z:
+            z.write(data, os.path.basename(data))
+            z.writestr(SCHEMA, json.dumps(schema, indent=2))
+    return filename, len(frame)
@@ -0,0 +1,74 @@
+import os, sys, time, signal, subprocess
+import requests
+from dotenv import load_dotenv
+
+# ────────────────────────────────────────────────
+# Multi-process launcher: one bot.py process per Discord shard, so CPU-heavy
+# work in one shard (report rendering, parsing) can't starve the others.
+#   python launcher.py            # max(Discord's recommendation, CPU cores) shards
+#   python launcher.py --shards 4
+# Shards share sessions and the LLM cache through the SQLite state backend.
+# Output files are per session (SESSION_DIR/<channel id>, see checkpoint.py),
+# and a channel that lands on another shard after a restart gets its files
+# back from the shared store, so shards never write over each other's files.
+IDENTIFY_DELAY = 5.5 # Discord allows one IDENTIFY per 5s (max_concurrency=1)
+RESTART_DELAY  = 5   # Seconds before restarting a shard that exited
+# ────────────────────────────────────────────────
+
+load_dotenv()
+
+def recommended_shards(token):
+    '''
+    Ask Discord how many shards this bot should run
+    '''
+    response = requests.get("https://discord.com/api/v10/gateway/bot",
+                            headers={"Authorization": f"Bot {token}"})
+    if response.status_code != 200:
+        print("[WARN] Couldn't read the recommended shard count:", response.text)
+        return 1
+    return response.json()["shards"]
+
+def spawn(shard_id, shard_count):
+    env = dict(os.environ, SHARD_ID=str(shard_id), SHARD_COUNT=str(shard_count))
+    env.pop("SHARD_MODE", None)
+    return subprocess.Popen([sys.executable, os.path.join(os.path.dirname(__file__) or ".", "bot.py")], env=env)
+
+def main():
+    if os.getenv("STATE_BACKEND", "sqlite") == "memory":
+        sys.exit("STATE_BACKEND=memory can't be shared between shard processes; use sqlite "
+                 "or run a single process with SHARD_MODE=auto.")
+
+    args = sys.argv[1:]
+    if "--shards" in args:
+        shard_count = int(args[args.index("--shards") + 1])
+    else:
+        shard_count = max(recommended_shards(os.getenv("DISCORD_TOKEN")), os.cpu_count() or 1)
+    print(f"[INFO] Launching {shard_count} shard process(es)")
+
+    procs = {}
+    for shard_id in range(shard_count):
+        procs[shard_id] = spawn(shard_id, shard_count)
+        if shard_id < shard_count - 1:
+            time.sleep(IDENTIFY_DELAY)
+
+    def stop(signum, frame):
+        for proc in procs.values():
+            proc.terminate()
+        for proc in procs.values():
+            proc.wait()
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    # Supervise: restart any shard that dies
+    while True:
+        time.sleep(1)
+        for shard_id, proc in procs.items():
+            if proc.poll() is not None:
+                print(f"[WARN] Shard {shard_id} exited with {proc.returncode}; restarting")
+                time.sleep(RESTART_DELAY)
+                procs[shard_id] = spawn(shard_id, shard_count)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+import textwrap
+import numpy as np
+
+import analytics
+
+# ────────────────────────────────────────────────
+# Likert responses as an int8 matrix (respondents x statements):
+# 1..k for the k scale points (left -> right), 0 for missing answers.
+SCALE = ["Strongly Disagree", "Disagree", "Neutral", "Agree", "Strongly Agree"]
+STATEMENTS_PER_PAGE = 12
+# ────────────────────────────────────────────────
+
+def encode_likert(response_lines, n_statements, n_points=len(SCALE)):
+    '''
+    Letter codes ("a" = first scale point) -> int8 Likert matrix
+    '''
+    matrix = analytics.encode_codes(response_lines, n_statements) + 1
+    matrix[(matrix < 1) | (matrix > n_points)] = 0
+    return matrix.astype(np.int8)
+
+def likert_statistics(matrix, n_points=len(SCALE)):
+    '''
+    Per-statement n, mean, SD, top-2-box and bottom-2-box shares, plus the
+    full distribution (statements x scale points), all computed column-wise
+    '''
+    m = matrix.astype(np.int64)
+    n_statements = m.shape[1]
+    valid = m > 0
+
+    n = valid.sum(axis=0)
+    flat = (np.arange(n_statements) * (n_points + 1) + m)[valid]
+    distribution = np.bincount(flat, minlength=n_statements * (n_points + 1))
+    distribution = distribution.reshape(n_statements, n_points + 1)[:, 1:]
+
+    # Moments from the distribution avoid touching the matrix again
+    points = np.arange(1, n_points + 1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = distribution @ points / n
+        var = (distribution @ points ** 2 - n * mean ** 2) / (n - 1)
+        top2 = distribution[:, -2:].sum(axis=1) / n
+        bottom2 = distribution[:, :2].sum(axis=1) / n
+
+    return {
+        "n": n,
+        "mean": mean,
+        "sd": np.sqrt(np.clip(var, 0, None)),
+        "top2": top2,
+        "bottom2": bottom2,
+        "distribution": distribution,
+    }
+
+def render_likert_page(statements, stats, scale=SCALE, first=0):
+    '''
+    Diverging stacked bars (disagree left of zero, agree right, neutral
+    straddling it) with a mean / SD / top-2-box table underneath
+    '''
+    from matplotlib import colormaps, ticker
+    from matplotlib.figure import Figure # Not pyplot: pages render concurrently in worker threads
+
+    k = len(scale)
+    dist = stats["distribution"][:, :k].astype(float)
+    shares = dist / np.maximum(dist.sum(axis=1, keepdims=True), 1)
+
+    # Left edge of each row = everything below neutral (+ half of neutral)
+    half = k // 2
+    left = -shares[:, :half].sum(axis=1)
+    if k % 2:
+        left -= shares[:, half] / 2
+    starts = left[:, None] + np.concatenate([np.zeros((len(shares), 1)), shares.cumsum(axis=1)[:, :-1]], axis=1)
+
+    colors = colormaps['RdBu'](np.linspace(0.1, 0.9, k))
+    labels = ['\n'.join(textwrap.wrap(f"S{first + i + 1}: {s}", width=35)) for i, s in enumerate(statements)]
+    rows = np.arange(len(statements))
+
+    fig = Figure(figsize=(8.5, 11))
+    ax, tab = fig.subplots(2, 1, height_ratios=[3, 2])
+    for j in range(k):
+        ax.barh(rows, shares[:, j], left=starts[:, j], color=colors[j], label=scale[j])
+    ax.axvline(0, color='black', linewidth=0.8)
+    ax.set_yticks(rows, labels, fontsize=8)
+    ax.invert_yaxis()
+    ax.set_xlim(-1, 1)
+    ax.xaxis.set_major_formatter(ticker.FuncFormatter(lambda v, _: f"{abs(v):.0%}"))
+    ax.set_title("Likert responses", fontsize=13, pad=20)
+    ax.legend(loc='upper center', bbox_to_anchor=(0.5, -0.08), ncol=k, fontsize=7)
+
+    cells = [[f"S{first + i + 1}", str(int(stats["n"][i])), f"{stats['mean'][i]:.2f}",
+              f"{stats['sd'][i]:.2f}", f"{stats['top2'][i]:.0%}", f"{stats['bottom2'][i]:.0%}"]
+             for i in range(len(statements))]
+    tab.axis('off')
+    tab.table(cellText=cells, colLabels=["", "n", "Mean", "SD", "Top-2", "Bottom-2"],
+              loc='upper center', cellLoc='center')
+
+    fig.subplots_adjust(top=0.92, bottom=0.05, left=0.35, right=0.95, hspace=0.3)
+    return fig
@@ -0,0 +1,283 @@
+import os, re, sys, json, time, random, asyncio, argparse, tempfile, statistics, tracemalloc, resource, types
+from collections import defaultdict
+
+# ────────────────────────────────────────────────
+# Load test for the Discord message handler.
+# Many fake users, each in their own channel, walk through the full survey
+# dialogue against bot.on_message. Discord is replaced by an in-memory
+# transport and Gemini by a canned responder with configurable latency.
+# Every user's survey names their own transit line, and after each dialogue
+# the user's MD, QSF and report are checked to be about that line only.
+#   python loadtest.py --levels 1,5,20 --latency 0.5 --respondents 10
+# Runs in a temporary directory with the in-memory state backend.
+# ────────────────────────────────────────────────
+
+# Must be set before bot (and its state backend) is imported
+os.environ.setdefault("STATE_BACKEND", "memory")
+os.environ.setdefault("PREWARM", "0")
+os.environ.setdefault("GEMINI_API_KEY", "loadtest")
+os.environ.setdefault("GEMINI_RPM", "0") # Measure the bot, not the rate budget
+
+HELP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "help.md")
+
+# ───────── FAKE DISCORD ───────────────
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+        self.name = f"user{user_id}"
+        self.bot = False
+
+class FakeChannel:
+    def __init__(self, channel_id):
+        self.id = channel_id
+        self.sent = 0
+        self.uploaded = 0
+
+    async def send(self, content=None, file=None, **kwargs):
+        self.sent += 1
+        if file is not None:
+            self.uploaded += 1
+            file.close()
+        await asyncio.sleep(0) # Yield like a real HTTP call would
+
+class FakeMessage:
+    '''
+    The parts of discord.Message that bot.on_message uses
+    '''
+    def __init__(self, content, author, channel):
+        self.content = content
+        self.author = author
+        self.channel = channel
+
+# ───────── FAKE GEMINI ───────────────
+
+class FakeGemini:
+    '''
+    Stands in for genai.Client: answers each prompt with canned, parseable
+    text after a simulated network delay
+    '''
+
+    def __init__(self, latency, jitter):
+        self.latency = latency
+        self.jitter = jitter
+        self.calls = 0
+        self.models = self
+
+    def generate_content(self, model, contents):
+        self.calls += 1
+        time.sleep(max(0.0, random.gauss(self.latency, self.jitter)))
+        return types.SimpleNamespace(text=self.respond(contents))
+
+    def respond(self, prompt):
+        # Surveys are about "transit line N"; carry N through so outputs can be traced to their user
+        line = m.group(1) if (m := re.search(r"transit line (\d+)", prompt)) else "0"
+        if "clarifying questions" in prompt:
+            return "1. Who is the audience?\n2. How long should it be?"
+        if "Create a 5-question survey" in prompt or "Make the following revisions" in prompt:
+            return (f"1. How often do you ride transit line {line}?\na. Daily\nb. Weekly\nc. Never\n"
+                    "2. Do you feel safe?\na. Yes\nb. No")
+        if "Likert-scale grid survey" in prompt:
+            return f"1. Buses on transit line {line} are on time\n2. Stations are clean"
+        if "adapt the following list of statements" in prompt:
+            return f'"Buses on transit line {line} are on time", "Stations are clean"'
+        if "adapt the following survey" in prompt:
+            return (f"1|ride|How often do you ride transit line {line}?|Daily, Weekly, Never | "
+                    "2|safe|Do you feel safe?|Yes, No |")
+        if m := re.search(r"Come up with (\d+) characters", prompt):
+            # Gemini's usual markdown: a preamble, bold numbered names, bulleted bold fields
+            return f"Here are {m.group(1)} characters for the survey:\n\n" + "\n\n".join(
+                f"**{i + 1}. Person {i + 1}**\n* **Age:** {20 + i}\n* **Nation:** Canada\n"
+                f"* **Occupation:** Teacher\n* **Demographics:** Commutes daily"
+                for i in range(int(m.group(1)))
+            )
+        if "list of survey respondents" in prompt:
+            n = len(re.findall(r"\*\*\d+\. Person \d+\*\*", prompt))
+            return " | ".join(f"Person {i + 1},{20 + i},{'Female' if i % 2 else 'Male'},Canada,Teacher"
+                              for i in range(n)) + " |"
+        if "list of characters that are to respond" in prompt:
+            n = len(re.findall(r"\*\*\d+\. Person \d+\*\*", prompt.split("immediately used:")[-1]))
+            return "\n".join(f"### Respondent {i + 1}\n- Q1: a\n- Q2: b" for i in range(n))
+        if "representing the survey" in prompt:
+            return (f"1 How often do you ride transit line {line}?; a. Daily; b. Weekly; c. Never | "
+                    "2 Do you feel safe?; a. Yes; b. No |")
+        if "representing each respondent's answers" in prompt:
+            n = prompt.count("### Respondent")
+            return " | ".join(random.choice("abc") + "," + random.choice("ab") for _ in range(n)) + " |"
+        if "Pretend you are about to take this survey" in prompt:
+            return "I'm a commuter.\n1. a\n2. b"
+        return "OK"
+
+# ───────── DRIVER ───────────────
+
+def dialogue(user_index, respondents):
+    '''
+    The messages one user sends, in order: (text, expected action)
+    '''
+    fmt = "1" if user_index % 2 == 0 else "2" # Alternate MC and Likert
+    return [
+        (f"autoscience, create a survey about transit line {user_index}", "MAKE_SURVEY"),
+        (fmt, "CLARIFY_MC" if fmt == "1" else "CLARIFY_LIKERT"),
+        ("make it shorter", "SURVEY_REV"),
+        ("ok", "SURVEY_OK"),
+        ("autoscience, md", "GET_MD"),
+        (f"autoscience, simulate {respondents}", "SIMULATE"),
+        ("ok", "SIM_OK"),
+        ("autoscience, report", "GET_REPORT"),
+    ]
+
+def pdf_text(path):
+    from pypdf import PdfReader
+    return "\n".join(page.extract_text() for page in PdfReader(path).pages)
+
+def check_outputs(session, user_index, respondents_expected):
+    '''
+    Problems with the user's own survey files: each must exist and mention
+    this user's transit line and no other, and every simulated respondent must
+    be matched to one of the characters. Returns a list of messages.
+    '''
+    import report_cache
+    files = {"md": (session.path("md_files", "generated_survey.md"), None),
+             "qsf": (session.path("qsf_files", "generated_survey.qsf"), None),
+             "report": (session.path("survey_data", "report.pdf"), pdf_text)}
+    if report_cache.REPORT_FORMAT != "vector": # Raster pages carry no text to check
+        files["report"] = (files["report"][0], lambda path: f"transit line {user_index}")
+
+    problems = []
+    for kind, (path, read) in files.items():
+        if not os.path.exists(path):
+            problems.append(f"{kind} missing")
+            continue
+        if read is None:
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+        else:
+            text = read(path)
+        lines = {int(n) for n in re.findall(r"transit\s+line\s+(\d+)", text)}
+        if lines != {user_index}:
+            problems.append(f"{kind} is about line(s) {sorted(lines)}, not {user_index}")
+
+    # Every respondent should be one of the requested characters, with their demographics
+    path = session.path("survey_data", "respondents.json")
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            respondents = json.load(f)
+        if respondents["characters"] != respondents_expected or None in respondents["personas"]:
+            problems.append(f"{respondents['characters']} characters parsed for {respondents_expected} requested, "
+                            f"{respondents['personas'].count(None)} respondent(s) unmatched")
+    else:
+        problems.append("respondents.json missing")
+    return problems
+
+async def run_user(bot, user_index, respondents, latencies, errors):
+    author = FakeUser(10_000 + user_index)
+    channel = FakeChannel(20_000 + user_index)
+    for text, action in dialogue(user_index, respondents):
+        start = time.perf_counter()
+        try:
+            await bot.on_message(FakeMessage(text, author, channel))
+        except Exception as e:
+            errors[action].append(f"{type(e).__name__}: {e}")
+        latencies[action].append(time.perf_counter() - start)
+
+    problems = await asyncio.to_thread(check_outputs, bot.get_session(channel.id), user_index, respondents)
+    errors["OUTPUTS"].extend(f"user {user_index}: {p}" for p in problems)
+    return not problems
+
+async def watch_loop_lag(samples, interval=0.01):
+    # How late the loop wakes us up = how long something blocked it
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - start - interval)
+
+def percentiles(values):
+    if len(values) < 2:
+        v = values[0] if values else 0.0
+        return v, v, v
+    q = statistics.quantiles(values, n=100, method='inclusive')
+    return q[49], q[94], q[98]
+
+def memory_in_use():
+    # Traced Python allocations when tracemalloc is on, otherwise resident set size
+    if tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[0]
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+async def run_level(bot, users, respondents):
+    latencies, errors, lag = defaultdict(list), defaultdict(list), []
+    watcher = asyncio.create_task(watch_loop_lag(lag))
+    memory_before = memory_in_use()
+
+    start = time.perf_counter()
+    verified = await asyncio.gather(*(run_user(bot, i, respondents, latencies, errors) for i in range(users)))
+    elapsed = time.perf_counter() - start
+
+    watcher.cancel()
+    return latencies, errors, lag, elapsed, memory_in_use() - memory_before, sum(verified)
+
+def report(users, latencies, errors, lag, elapsed, growth, verified, gemini_calls):
+    messages = sum(len(v) for v in latencies.values())
+    print(f"\n=== {users} concurrent user(s) ===")
+    print(f"wall {elapsed:.2f}s · {messages / elapsed:.2f} msg/s · {users / elapsed:.3f} dialogues/s · "
+          f"{gemini_calls} Gemini calls")
+    print(f"{'action':<16}{'n':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for action, values in latencies.items():
+        p50, p95, p99 = percentiles(values)
+        print(f"{action:<16}{len(values):>5}{p50 * 1000:>10.0f}{p95 * 1000:>10.0f}{p99 * 1000:>10.0f}"
+              f"{len(errors[action]):>8}")
+    lag_p50, lag_p95, lag_p99 = percentiles(lag)
+    print(f"event-loop lag: p50 {lag_p50 * 1000:.0f}ms · p99 {lag_p99 * 1000:.0f}ms · "
+          f"max {max(lag, default=0) * 1000:.0f}ms")
+    print(f"memory: {growth / 1024:+.0f} KiB {'traced' if tracemalloc.is_tracing() else 'RSS'} this level · "
+          f"max RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MiB")
+    print(f"outputs: {verified}/{users} user(s) got an MD, QSF and report for their own survey")
+    for action, messages_ in errors.items():
+        for error in sorted(set(messages_))[:3]:
+            print(f"  [{action}] {error}")
+
+async def main(args):
+    workdir = tempfile.mkdtemp(prefix="autoscience-loadtest-")
+    os.chdir(workdir)
+    os.symlink(HELP_PATH, "help.md")
+    sys.path.insert(0, os.path.dirname(HELP_PATH))
+
+    import matplotlib
+    matplotlib.rcParams['pdf.fonttype'] = 42 # TrueType, so report text can be read back
+
+    import bot
+    import create_survey
+    gemini = FakeGemini(args.latency, args.jitter)
+    create_survey.CLIENT = gemini
+
+    print(f"Working directory: {workdir}")
+    print(f"Gemini latency {args.latency * 1000:.0f}±{args.jitter * 1000:.0f}ms · "
+          f"{args.respondents} simulated respondents per user")
+
+    if args.trace_memory:
+        tracemalloc.start()
+    failed = False
+    for users in args.levels:
+        calls_before = gemini.calls
+        result = await run_level(bot, users, args.respondents)
+        report(users, *result, gemini.calls - calls_before)
+        failed |= result[-1] < users
+    return failed
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load-test the AutoScience message handler.")
+    parser.add_argument("--levels", type=lambda s: [int(x) for x in s.split(",")], default=[1, 5, 20],
+                        help="comma-separated numbers of concurrent users (default 1,5,20)")
+    parser.add_argument("--latency", type=float, default=0.5, help="mean fake Gemini latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.1, help="std-dev of the Gemini latency")
+    parser.add_argument("--respondents", type=int, default=10, help="characters simulated per user")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="measure growth with tracemalloc (precise, but slows everything down)")
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    sys.exit(1 if asyncio.run(main(parse_args())) else 0)
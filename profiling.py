@@ -0,0 +1,202 @@
+import os, sys, time, pstats, asyncio, inspect, cProfile, threading, functools, contextlib, contextvars
+from collections import Counter, defaultdict
+
+# ────────────────────────────────────────────────
+# On-demand profiling for admins.
+# A profiled command runs under cProfile plus a sampling
+# profiler (all threads, so Gemini calls in worker threads show up too), and
+# every create_survey / display_data call is timed as a span. Results are
+# written as collapsed stacks (flamegraph.pl / speedscope) and summarised.
+# Spans belong to the profiled command alone; cProfile and the sampler see
+# the whole process, so the summary lists any commands that overlapped.
+ADMIN_IDS       = {i.strip() for i in os.getenv("ADMIN_IDS", "").split(",") if i.strip()}
+PROFILE_DIR     = os.getenv("PROFILE_DIR", "profiles")
+SAMPLE_INTERVAL = 0.005 # Seconds between stack samples
+TOP_N           = 12
+# ────────────────────────────────────────────────
+
+_ACTIVE  = contextvars.ContextVar("active_profile", default=None)
+_BUSY    = threading.Lock() # cProfile can only run one profile at a time
+_RUNNING = {}   # Task -> label of every command in flight (event loop thread only)
+_CURRENT = None # The Profile being recorded, if any
+
+def is_admin(user):
+    return str(user.id) in ADMIN_IDS
+
+@contextlib.contextmanager
+def span(name):
+    '''
+    Time a block; recorded only while the current task is being profiled
+    '''
+    profile = _ACTIVE.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.spans.append((name, time.perf_counter() - start))
+
+class Instrumented:
+    '''
+    Module proxy that wraps every function call in a span named module.function
+    '''
+
+    def __init__(self, module):
+        self.__wrapped__ = module
+        self._wrappers = {}
+
+    def __getattr__(self, attr):
+        if attr in self._wrappers:
+            return self._wrappers[attr]
+        value = getattr(self.__wrapped__, attr)
+        if not callable(value) or isinstance(value, type):
+            return value # Classes (e.g. exceptions) must stay usable in `except`
+
+        name = f"{self.__wrapped__.__name__}.{attr}"
+        if inspect.iscoroutinefunction(value):
+            @functools.wraps(value)
+            async def wrapper(*args, **kwargs):
+                with span(name):
+                    return await value(*args, **kwargs)
+        else:
+            @functools.wraps(value)
+            def wrapper(*args, **kwargs):
+                with span(name):
+                    return value(*args, **kwargs)
+        self._wrappers[attr] = wrapper
+        return wrapper
+
+def instrument(module):
+    return Instrumented(module)
+
+@contextlib.contextmanager
+def command(label):
+    '''
+    Mark a bot command as in flight, so a profile running alongside it can
+    report the overlap
+    '''
+    if label is None: # Not a command
+        yield
+        return
+    task = asyncio.current_task()
+    _RUNNING[task] = label
+    if _CURRENT is not None and task is not _CURRENT.task:
+        _CURRENT.overlapped.append(label)
+    try:
+        yield
+    finally:
+        _RUNNING.pop(task, None)
+
+class Profile:
+
+    def __init__(self, label):
+        self.label = label
+        self.spans = []
+        self.samples = Counter()
+        self.profiler = cProfile.Profile()
+        self.stopped = threading.Event()
+        self.wall = 0.0
+        self.task = None
+        self.overlapped = [] # Other commands that ran while this one was profiled
+
+    def _sample(self):
+        # Keep per-sample work minimal; frames are formatted in write()
+        own = threading.get_ident()
+        while not self.stopped.is_set():
+            time.sleep(SAMPLE_INTERVAL)
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+                self.samples[(ident, tuple(stack))] += 1
+
+    def collapsed(self):
+        # "thread;outer (file:line);...;inner (file:line) count" lines
+        names = {t.ident: t.name for t in threading.enumerate()}
+        lines = Counter()
+        for (ident, stack), count in self.samples.items():
+            frames = [f"{c.co_name} ({os.path.basename(c.co_filename)}:{c.co_firstlineno})" for c in reversed(stack)]
+            lines[";".join([names.get(ident, f"thread-{ident}")] + frames)] += count
+        return lines
+
+    def write(self):
+        '''
+        Save collapsed stacks and pstats
+        Returns the collapsed-stack path
+        '''
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        base = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}_{self.label.lower()}")
+        with open(f"{base}.collapsed", 'w', encoding='utf-8') as f:
+            for stack, count in self.collapsed().most_common():
+                f.write(f"{stack} {count}\n")
+        self.profiler.dump_stats(f"{base}.pstats")
+        return f"{base}.collapsed"
+
+    def summary(self):
+        lines = [f"**Profile of {self.label}: {self.wall:.2f}s wall**"]
+        if self.overlapped:
+            others = ", ".join(f"{label} ×{n}" if n > 1 else label for label, n in Counter(self.overlapped).items())
+            lines.append(f"⚠️ Overlapped with {others}: cProfile and the stack samples include "
+                         "their work; spans are this command's only.")
+
+        totals, counts = defaultdict(float), Counter()
+        for name, secs in self.spans:
+            totals[name] += secs
+            counts[name] += 1
+        if totals:
+            lines.append("Spans:")
+            for name, secs in sorted(totals.items(), key=lambda kv: -kv[1]):
+                lines.append(f"`{secs:7.2f}s` {name} ×{counts[name]}")
+
+        # On Python 3.12+ cProfile sees every thread, so leave out the sampler's own calls
+        stats = pstats.Stats(self.profiler).stats
+        sampler = {key for key in stats if key[2] == '_sample' and key[0] == __file__}
+        while True:
+            only_sampler = {key for key, (*_, callers) in stats.items()
+                            if key not in sampler and callers and set(callers) <= sampler}
+            if not only_sampler:
+                break
+            sampler |= only_sampler
+        rows = sorted(((k, v) for k, v in stats.items() if k not in sampler), key=lambda kv: -kv[1][3])[:TOP_N]
+        lines.append(f"Top {len(rows)} by cumulative time (cProfile):")
+        for (filename, line, func), (_, calls, _, cumulative, _) in rows:
+            lines.append(f"`{cumulative:7.2f}s` {func} ({os.path.basename(filename)}:{line}) ×{calls}")
+
+        summary = "\n".join(lines)
+        return summary if len(summary) <= 1990 else summary[:1989] + "…"
+
+@contextlib.asynccontextmanager
+async def profile(label):
+    '''
+    Profile the enclosed block. Yields the Profile, or None if another
+    profile is already running.
+    '''
+    if not _BUSY.acquire(blocking=False):
+        yield None
+        return
+
+    global _CURRENT
+    prof = Profile(label)
+    prof.task = asyncio.current_task()
+    prof.overlapped = [name for task, name in _RUNNING.items() if task is not prof.task]
+    _CURRENT = prof
+    token = _ACTIVE.set(prof)
+    sampler = threading.Thread(target=prof._sample, name="profiler", daemon=True)
+    start = time.perf_counter()
+    sampler.start()
+    prof.profiler.enable()
+    try:
+        yield prof
+    finally:
+        prof.profiler.disable()
+        prof.wall = time.perf_counter() - start
+        prof.stopped.set()
+        sampler.join()
+        _CURRENT = None
+        _ACTIVE.reset(token)
+        _BUSY.release()
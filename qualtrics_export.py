@@ -0,0 +1,153 @@
+import os, io, csv, json, asyncio, tempfile, zipfile
+from cassette import http # requests.get / post, recorded or replayed when CASSETTE_MODE is set
+
+from create_survey import BASE_URL, HEADERS
+from display_data import update_tally, generate_pdf_report
+
+# ────────────────────────────────────────────────
+# Qualtrics response exports -> display_data report.
+# Exports are started and polled with backoff, the zipped CSV is streamed to a
+# temp file, and rows are tallied in chunks so the export never sits in memory.
+POLL_START   = 1.0   # Seconds before the first progress check
+POLL_MAX     = 10.0  # Longest wait between progress checks
+POLL_TIMEOUT = 600   # Give up on an export after this many seconds
+CHUNK_BYTES  = 1 << 16
+ROWS_PER_TALLY = 1000
+# ────────────────────────────────────────────────
+
+class QualtricsExportError(RuntimeError):
+    pass
+
+def _check(response):
+    if response.status_code != 200:
+        raise QualtricsExportError(f"Qualtrics returned {response.status_code}: {response.text[:200]}")
+    return response
+
+def fetch_questions(survey_id, base_url=BASE_URL, headers=HEADERS):
+    '''
+    Read the survey definition and flatten it into report questions
+    Returns (questions, columns): questions are (text, choices) pairs as used by
+    display_data; columns are (ImportId, {recode: letter}) in the same order
+    '''
+    response = _check(http.get(f"{base_url}/survey-definitions/{survey_id}", headers=headers))
+    definition = response.json()['result']['Questions']
+
+    questions, columns = [], []
+    for qid in sorted(definition, key=lambda q: int(q[3:]) if q[3:].isdigit() else 0):
+        q = definition[qid]
+        choices = q.get('Choices') or {}
+        order = [str(c) for c in q.get('ChoiceOrder', choices.keys())]
+        # Without labels the export holds each option's recode value, which is its ID unless recoded
+        recode = {str(k): str(v) for k, v in (q.get('RecodeValues') or {}).items()}
+
+        if q.get('QuestionType') == 'MC':
+            questions.append((q['QuestionText'], [choices[c]['Display'] for c in order]))
+            columns.append((qid, {recode.get(c, c): chr(ord('a') + j) for j, c in enumerate(order)}))
+
+        elif q.get('QuestionType') == 'Matrix':
+            # Each matrix row is reported as its own question over the shared scale
+            answers = q.get('Answers') or {}
+            answer_order = [str(a) for a in q.get('AnswerOrder', answers.keys())]
+            scale = [answers[a]['Display'] for a in answer_order]
+            letters = {recode.get(a, a): chr(ord('a') + j) for j, a in enumerate(answer_order)}
+            for c in order:
+                questions.append((choices[c]['Display'], scale))
+                columns.append((f"{qid}_{c}", letters))
+
+    return questions, columns
+
+def start_export(survey_id, base_url=BASE_URL, headers=HEADERS):
+    body = {"format": "csv", "useLabels": False, "compress": True}
+    response = _check(http.post(f"{base_url}/surveys/{survey_id}/export-responses",
+                                    headers=headers, json=body))
+    return response.json()['result']['progressId']
+
+async def wait_for_export(survey_id, progress_id, base_url=BASE_URL, headers=HEADERS):
+    '''
+    Poll export progress with exponential backoff
+    Returns the fileId of the finished export
+    '''
+    url = f"{base_url}/surveys/{survey_id}/export-responses/{progress_id}"
+    delay, waited = POLL_START, 0.0
+    while waited < POLL_TIMEOUT:
+        response = await asyncio.to_thread(http.get, url, headers=headers)
+        result = _check(response).json()['result']
+        if result['status'] == 'complete':
+            return result['fileId']
+        if result['status'] == 'failed':
+            raise QualtricsExportError("Qualtrics failed to build the response export.")
+
+        await asyncio.sleep(delay)
+        waited += delay
+        delay = min(delay * 1.5, POLL_MAX)
+
+    raise QualtricsExportError("Timed out waiting for the Qualtrics export.")
+
+def download_export(survey_id, file_id, base_url=BASE_URL, headers=HEADERS):
+    '''
+    Stream the zipped export to a temporary file
+    Returns the file path (caller removes it)
+    '''
+    url = f"{base_url}/surveys/{survey_id}/export-responses/{file_id}/file"
+    with http.get(url, headers=headers, stream=True) as response:
+        _check(response)
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.zip') as tmp:
+            for chunk in response.iter_content(chunk_size=CHUNK_BYTES):
+                tmp.write(chunk)
+    return tmp.name
+
+def iter_export_rows(path, columns):
+    '''
+    Yield one list of letter codes per respondent, decompressing the CSV as
+    it is read. Unanswered questions come back as ''.
+    '''
+    with zipfile.ZipFile(path) as archive:
+        member = next(n for n in archive.namelist() if n.endswith('.csv'))
+        with archive.open(member) as raw:
+            reader = csv.reader(io.TextIOWrapper(raw, encoding='utf-8-sig', newline=''))
+
+            # Three header rows: export tags, question text, {"ImportId": ...}
+            next(reader), next(reader)
+            import_ids = [json.loads(cell).get('ImportId', '') if cell.startswith('{') else ''
+                          for cell in next(reader)]
+            positions = [(import_ids.index(col) if col in import_ids else None, letters)
+                         for col, letters in columns]
+
+            for row in reader:
+                yield [letters.get(row[i], '') if i is not None and i < len(row) else ''
+                       for i, letters in positions]
+
+def tally_export(path, questions, columns):
+    tally = [dict() for _ in questions]
+    respondents, chunk = 0, []
+    for codes in iter_export_rows(path, columns):
+        chunk.append(codes)
+        if len(chunk) >= ROWS_PER_TALLY:
+            update_tally(tally, chunk)
+            respondents += len(chunk)
+            chunk = []
+    update_tally(tally, chunk)
+    return tally, respondents + len(chunk)
+
+# Entrypoint
+async def fetch_qualtrics_report(survey_id, filename="survey_data/qualtrics_report.pdf",
+                                 base_url=BASE_URL, headers=HEADERS):
+    '''
+    Export a Qualtrics survey's responses and build a PDF report from them
+    Returns (report path, number of respondents)
+    '''
+    questions, columns = await asyncio.to_thread(fetch_questions, survey_id, base_url, headers)
+    if not questions:
+        raise QualtricsExportError("That survey has no multiple-choice or matrix questions to report on.")
+
+    progress_id = await asyncio.to_thread(start_export, survey_id, base_url, headers)
+    file_id = await wait_for_export(survey_id, progress_id, base_url, headers)
+    path = await asyncio.to_thread(download_export, survey_id, file_id, base_url, headers)
+    try:
+        tally, respondents = await asyncio.to_thread(tally_export, path, questions, columns)
+    finally:
+        os.remove(path)
+
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    await asyncio.to_thread(generate_pdf_report, questions, tally, filename)
+    return filename, respondents
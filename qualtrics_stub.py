@@ -0,0 +1,102 @@
+import io, re, csv, json, random, zipfile, threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# ────────────────────────────────────────────────
+# Local stand-in for the Qualtrics export endpoints used by qualtrics_export.py.
+#   python qualtrics_stub.py [respondents]
+# then point the bot at it with QUALTRICS_BASE_URL=http://127.0.0.1:8765/API/v3
+STUB_SURVEY_ID = "SV_stub"
+POLLS_BEFORE_COMPLETE = 2
+# ────────────────────────────────────────────────
+
+STUB_QUESTIONS = {
+    "QID1": {
+        "QuestionText": "How often do you ride public transit?",
+        "QuestionType": "MC", "DataExportTag": "Q1",
+        "Choices": {"1": {"Display": "Daily"}, "2": {"Display": "Weekly"}, "3": {"Display": "Never"}},
+        "ChoiceOrder": ["1", "2", "3"],
+    },
+    "QID4": {
+        "QuestionText": "Please rate how much you agree with each statement:",
+        "QuestionType": "Matrix", "DataExportTag": "transit",
+        "Choices": {"1": {"Display": "Buses are on time"}, "2": {"Display": "Stations are clean"}},
+        "ChoiceOrder": ["1", "2"],
+        "Answers": {str(i + 1): {"Display": a} for i, a in enumerate(
+            ["Strongly Disagree", "Disagree", "Neutral", "Agree", "Strongly Agree"])},
+        "AnswerOrder": ["1", "2", "3", "4", "5"],
+    },
+}
+
+def build_export(respondents, seed=0):
+    '''
+    Zipped CSV in Qualtrics' export layout (three header rows, recode values)
+    '''
+    rng = random.Random(seed)
+    text = io.StringIO()
+    writer = csv.writer(text)
+    writer.writerow(["ResponseId", "Q1", "transit_1", "transit_2"])
+    writer.writerow(["Response ID", STUB_QUESTIONS["QID1"]["QuestionText"], "Buses are on time", "Stations are clean"])
+    writer.writerow([json.dumps({"ImportId": i}) for i in ("_recordId", "QID1", "QID4_1", "QID4_2")])
+    for r in range(respondents):
+        writer.writerow([f"R_{r}", rng.choice(["1", "2", "3", ""]), rng.randint(1, 5), rng.randint(1, 5)])
+
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("Stub Survey.csv", text.getvalue())
+    return buf.getvalue()
+
+def make_handler(respondents):
+    polls = {}
+    export = build_export(respondents)
+
+    class Handler(BaseHTTPRequestHandler):
+        def _json(self, payload, status=200):
+            body = json.dumps({"result": payload, "meta": {"httpStatus": f"{status}"}}).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if m := re.fullmatch(r"/API/v3/survey-definitions/(\w+)", self.path):
+                return self._json({"SurveyID": m[1], "Questions": STUB_QUESTIONS})
+            if m := re.fullmatch(r"/API/v3/surveys/\w+/export-responses/(\w+)/file", self.path):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/zip")
+                self.end_headers()
+                for i in range(0, len(export), 1 << 14):
+                    self.wfile.write(export[i:i + (1 << 14)])
+                return
+            if m := re.fullmatch(r"/API/v3/surveys/\w+/export-responses/(\w+)", self.path):
+                polls[m[1]] = polls.get(m[1], 0) + 1
+                if polls[m[1]] <= POLLS_BEFORE_COMPLETE:
+                    return self._json({"status": "inProgress", "percentComplete": 50.0})
+                return self._json({"status": "complete", "percentComplete": 100.0, "fileId": f"{m[1]}_file"})
+            self._json({"error": "not found"}, status=404)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if re.fullmatch(r"/API/v3/surveys/\w+/export-responses", self.path):
+                return self._json({"progressId": f"ES_{len(polls) + 1}"})
+            self._json({"error": "not found"}, status=404)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+def serve(port=8765, respondents=500, background=False):
+    '''
+    Start the stub server; with `background`, return it running in a thread
+    '''
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(respondents))
+    if background:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+    print(f"Qualtrics stub on http://127.0.0.1:{server.server_port}/API/v3 (survey {STUB_SURVEY_ID})")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    import sys
+    serve(respondents=int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,111 @@
+import os, sys, time, base64, asyncio, argparse, tempfile
+
+# ────────────────────────────────────────────────
+# Replay a recorded session offline.
+# Sends the cassette's messages through bot.on_message again, with every
+# Gemini / Qualtrics call answered from the cassette (see cassette.py). Each
+# message is sent once the calls recorded before it have been replayed and
+# the bot would take it as the same action, and only waits for the commands
+# that had finished before it arrived, so e.g. a "stop" lands mid-simulation
+# as it did live. A replay that asks for a call
+# the cassette doesn't have is reported as diverged.
+#   python replay.py cassettes/<channel id>.jsonl.gz [--latency zero] [--profile]
+# Runs in a temporary directory with the in-memory state backend.
+# ────────────────────────────────────────────────
+
+HELP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "help.md")
+
+class FakeAttachment:
+    def __init__(self, entry):
+        self.filename = entry["filename"]
+        self.size = entry["size"]
+        self.data = base64.b64decode(entry.get("b64", ""))
+
+    async def read(self):
+        return self.data
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay a recorded AutoScience session offline.")
+    parser.add_argument("cassette", help="path to a <session>.jsonl.gz cassette")
+    parser.add_argument("--latency", choices=["recorded", "zero"], default="recorded",
+                        help="wait as long as the recorded calls took, or not at all")
+    parser.add_argument("--profile", action="store_true",
+                        help="profile every message (collapsed stacks + pstats in PROFILE_DIR)")
+    parser.add_argument("--verbose", action="store_true", help="print the bot's replies")
+    return parser.parse_args()
+
+async def main(args):
+    import bot, cassette, profiling
+    from loadtest import FakeUser, FakeChannel, FakeMessage
+
+    class EchoChannel(FakeChannel):
+        async def send(self, content=None, file=None, **kwargs):
+            if args.verbose:
+                print(f"    > {(content or '').splitlines()[0][:100] if content else ''}"
+                      f"{f' [{file.filename}]' if file else ''}")
+            await super().send(content, file=file, **kwargs)
+
+    # The bot's calls are answered by this same Cassette, so its progress can be watched
+    recorded = cassette.Cassette(args.cassette)
+    cassette._CASSETTES[os.path.basename(args.cassette).removesuffix(".jsonl.gz")] = recorded
+    channels, tasks, diverged, total = {}, {}, [], time.perf_counter()
+    print(f"Replaying {len(recorded.messages)} message(s) from {args.cassette} "
+          f"({args.latency} latency) in {os.getcwd()}")
+
+    async def send(entry, message, action):
+        start = time.perf_counter()
+        try:
+            if args.profile:
+                async with profiling.profile(action or "none") as prof:
+                    await bot.on_message(message)
+                print(prof.summary() if prof else "(Overlapped a profiled message, so not profiled.)")
+                if prof:
+                    print(f"  stacks: {prof.write()}")
+            else:
+                await bot.on_message(message)
+            status = ""
+        except cassette.CassetteMiss as e:
+            diverged.append(entry)
+            status = f"  DIVERGED: {e}"
+        print(f"{time.perf_counter() - start:8.2f}s  {action or '-':<14} {entry['content'][:60]!r}{status}")
+
+    for entry in recorded.messages:
+        waits_for = entry["waits_for"] if entry["waits_for"] is not None else set(tasks)
+        earlier = [tasks[seq] for seq in waits_for if seq in tasks]
+        await asyncio.gather(*earlier)
+        channel = channels.setdefault(entry["channel"], EchoChannel(entry["channel"]))
+        message = FakeMessage(entry["content"], FakeUser(entry["author"]), channel)
+        message.attachments = [FakeAttachment(a) for a in entry["attachments"]]
+
+        # Let the still-running commands replay the calls recorded before this message
+        # and reach the state it was received in
+        while any(not t.done() for t in tasks.values()):
+            action = bot.detect_action(message.content, bot.get_session(channel.id))
+            if recorded.served >= entry["after"] and action == entry.get("action", action):
+                break
+            await asyncio.sleep(0.001)
+        action = bot.detect_action(message.content, bot.get_session(channel.id))
+        tasks[entry.get("seq", len(tasks))] = asyncio.create_task(send(entry, message, action))
+
+    await asyncio.gather(*tasks.values())
+    print(f"Total {time.perf_counter() - total:.2f}s"
+          + (f", {len(diverged)} message(s) diverged from the recording" if diverged else ""))
+    return not diverged
+
+if __name__ == '__main__':
+    args = parse_args()
+    path = os.path.abspath(args.cassette)
+    args.cassette = path
+
+    # Must be set before bot (and cassette) are imported
+    os.environ.update(CASSETTE_MODE="replay", CASSETTE_DIR=os.path.dirname(path), CASSETTE_LATENCY=args.latency)
+    os.environ.setdefault("STATE_BACKEND", "memory")
+    os.environ.setdefault("PREWARM", "0")
+    os.environ.setdefault("GEMINI_API_KEY", "replay")
+    os.environ["PROFILE_DIR"] = os.path.abspath(os.getenv("PROFILE_DIR", "profiles"))
+
+    sys.path.insert(0, os.path.dirname(HELP_PATH))
+    workdir = tempfile.mkdtemp(prefix="autoscience-replay-")
+    os.chdir(workdir)
+    os.symlink(HELP_PATH, "help.md")
+    sys.exit(0 if asyncio.run(main(args)) else 1)
@@ -0,0 +1,129 @@
+import os, io, json, hashlib, tempfile, threading
+from fpdf import FPDF
+from PIL import Image
+from pypdf import PdfWriter
+
+# ────────────────────────────────────────────────
+# Page-level render cache for the PDF report.
+# Each page is stored as a one-page vector PDF (text stays selectable and
+# searchable) named after a hash of everything that affects how it looks, so
+# unchanged questions are never re-rendered; pages are merged with pypdf.
+# REPORT_FORMAT=raster stores PNGs instead, which delivery.py can downsample.
+CACHE_DIR     = os.getenv("REPORT_CACHE_DIR", "survey_data/page_cache")
+MAX_PAGES     = int(os.getenv("REPORT_CACHE_MAX_PAGES", "500")) # Bound on cached pages kept on disk
+REPORT_FORMAT = os.getenv("REPORT_FORMAT", "vector") # "vector" or "raster"
+PAGE_DPI      = 150 # Raster pages only
+PAGE_SIZE     = (8.5, 11) # US letter, inches
+PAGE_EXTS     = {"vector": ".pdf", "raster": ".png"}
+# ────────────────────────────────────────────────
+
+def page_key(*parts):
+    '''
+    Fingerprint of a page's contents (question text, choices, counts, style...)
+    Returns a hex digest
+    '''
+    blob = json.dumps(parts, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(blob).hexdigest()
+
+def cached_page(key, render):
+    '''
+    Return the cached page for `key`, calling `render()` (which must return a
+    matplotlib Figure, created without pyplot) only on a cache miss
+    '''
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = os.path.join(CACHE_DIR, f"{key}{PAGE_EXTS[REPORT_FORMAT]}")
+
+    if os.path.exists(path):
+        os.utime(path) # Mark as recently used
+        return path
+
+    fig = render()
+
+    # Write atomically so a crashed render never leaves a truncated page behind
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    if REPORT_FORMAT == "vector":
+        fig.savefig(tmp, format='pdf')
+    else:
+        # FPDF can't embed PNGs with an alpha channel
+        buf = io.BytesIO()
+        fig.savefig(buf, format='png', dpi=PAGE_DPI)
+        buf.seek(0)
+        Image.open(buf).convert('RGB').save(tmp, 'PNG', optimize=True)
+    os.replace(tmp, path)
+    return path
+
+def prune(max_pages=MAX_PAGES):
+    '''
+    Drop the least-recently-used pages beyond `max_pages`
+    '''
+    if not os.path.isdir(CACHE_DIR):
+        return
+    entries = [e for e in os.scandir(CACHE_DIR) if e.name.endswith(tuple(PAGE_EXTS.values()))]
+    entries.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+    for entry in entries[max_pages:]:
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+def write_pdf(pages, filename):
+    '''
+    Merge one-page PDFs, or lay out images as full-bleed pages
+    '''
+    os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+    if all(page.endswith(".pdf") for page in pages):
+        writer = PdfWriter()
+        for page in pages:
+            writer.append(page)
+        with open(filename, 'wb') as f:
+            writer.write(f)
+        return filename
+
+    width, height = PAGE_SIZE
+    pdf = FPDF(unit='in', format='letter')
+    pdf.set_auto_page_break(False)
+    for page in pages:
+        pdf.add_page()
+        pdf.image(page, x=0, y=0, w=width, h=height)
+    pdf.output(filename, 'F')
+    return filename
+
+def assemble_pdf(pages, filename):
+    '''
+    Build the report PDF from its cached pages
+    '''
+    write_pdf(pages, filename)
+
+    # Remember which pages went in, so a smaller copy can be rebuilt later
+    with open(manifest_path(filename), 'w', encoding='utf-8') as f:
+        json.dump(list(pages), f)
+    return filename
+
+def manifest_path(filename):
+    return f"{filename}.pages.json"
+
+def downsample_pdf(filename, scale, quality=70, output=None):
+    '''
+    Rebuild `filename` from its cached raster pages as scaled-down JPEGs
+    Returns the new PDF's path, or None if it has no raster pages cached
+    (vector reports are already compact)
+    '''
+    try:
+        with open(manifest_path(filename), 'r', encoding='utf-8') as f:
+            pages = json.load(f)
+    except FileNotFoundError:
+        return None
+    if not all(page.endswith(".png") and os.path.exists(page) for page in pages):
+        return None
+
+    output = output or filename.replace(".pdf", f"_{int(scale * 100)}.pdf")
+    with tempfile.TemporaryDirectory(prefix="report-pages-") as tmpdir:
+        small = []
+        for i, page in enumerate(pages):
+            with Image.open(page) as img:
+                size = (max(1, int(img.width * scale)), max(1, int(img.height * scale)))
+                path = os.path.join(tmpdir, f"{i:04d}.jpg")
+                img.convert('RGB').resize(size, Image.LANCZOS).save(path, 'JPEG', quality=quality, optimize=True)
+            small.append(path)
+        write_pdf(small, output)
+    return output
@@ -0,0 +1,61 @@
+import sys, time, types, importlib, threading
+
+# ────────────────────────────────────────────────
+# Fast start: heavy modules (google-genai, matplotlib, pandas...) are imported
+# on first use of a command that needs them, or pre-warmed in the background
+# once the bot has connected. See bench_startup.py for the regression check.
+IMPORT_TIMES = {} # module name -> seconds spent importing it on first use
+# ────────────────────────────────────────────────
+
+class LazyModule(types.ModuleType):
+    '''
+    Stand-in that imports the real module on first attribute access
+    '''
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__['_lock'] = threading.Lock()
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            with self.__dict__['_lock']:
+                module = self.__dict__['_module']
+                if module is None:
+                    start = time.perf_counter()
+                    module = importlib.import_module(self.__name__)
+                    IMPORT_TIMES[self.__name__] = time.perf_counter() - start
+                    self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+def lazy_import(name):
+    # Already imported (e.g. by another lazy module) -> nothing to defer
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
+
+def prewarm(*modules):
+    '''
+    Import lazy modules on a daemon thread so the first real command doesn't
+    pay for them
+    '''
+    def run():
+        for module in modules:
+            if isinstance(module, LazyModule):
+                try:
+                    module._load()
+                except Exception as e:
+                    print(f"[WARN] Pre-warming {module.__name__} failed: {e}")
+        print("[INFO] Pre-warmed modules:",
+              ", ".join(f"{name} {secs * 1000:.0f}ms" for name, secs in IMPORT_TIMES.items()))
+
+    thread = threading.Thread(target=run, name="prewarm", daemon=True)
+    thread.start()
+    return thread
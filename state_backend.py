@@ -0,0 +1,189 @@
+import os, json, time, sqlite3, asyncio, threading, atexit
+
+# ────────────────────────────────────────────────
+# Shared state / cache backends.
+# Sessions, stage outputs and the LLM cache go through one backend per
+# process. "sqlite" is a file every shard process can open at once (WAL);
+# "memory" is an in-process stand-in for single-process runs and tests.
+STATE_BACKEND  = os.getenv("STATE_BACKEND", "sqlite")
+CHECKPOINT_DB  = os.getenv("CHECKPOINT_DB", "checkpoints.db") # Put on a Railway volume to survive redeploys
+FLUSH_INTERVAL = 0.5 # Seconds between batched writes
+# ────────────────────────────────────────────────
+
+class MemoryBackend:
+    '''
+    Dict-backed backend. Nothing is shared between processes or survives a
+    restart, so only use it with a single process (e.g. AutoShardedClient).
+    '''
+
+    def __init__(self):
+        self.sessions = {}
+        self.stages = {}
+        self.cache = {}
+
+    def load_session(self, key):
+        state = self.sessions.get(key)
+        return json.loads(state) if state else None
+
+    def load_stages(self, key):
+        '''
+        Returns {stage name: content} for a session
+        '''
+        return {name: content for (k, name), content in self.stages.items() if k == key}
+
+    def load_stage(self, key, name):
+        return self.stages.get((key, name))
+
+    def save_session(self, key, state):
+        self.sessions[key] = json.dumps(state)
+
+    def save_stage(self, key, name, content):
+        '''
+        Record a stage output (str or bytes); None deletes the stage
+        '''
+        if content is None:
+            self.stages.pop((key, name), None)
+        else:
+            self.stages[(key, name)] = content
+
+    def cache_get(self, key):
+        return self.cache.get(key)
+
+    def cache_put(self, key, value):
+        self.cache[key] = value
+
+    def flush(self):
+        pass
+
+    async def run_flusher(self, interval=FLUSH_INTERVAL):
+        pass
+
+class SQLiteBackend:
+    '''
+    SQLite-backed store. Writes are buffered (latest value per key wins) and
+    flushed together in one transaction; reads see buffered writes.
+    '''
+
+    def __init__(self, path=CHECKPOINT_DB):
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS sessions "
+                          "(key TEXT PRIMARY KEY, state TEXT NOT NULL, updated REAL NOT NULL)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS stages "
+                          "(key TEXT, name TEXT, content BLOB, updated REAL NOT NULL, "
+                          "PRIMARY KEY (key, name))")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS llm_cache "
+                          "(key TEXT PRIMARY KEY, value TEXT NOT NULL, updated REAL NOT NULL)")
+        self.lock = threading.Lock()
+        self.pending_sessions = {}
+        self.pending_stages = {}
+        self.pending_cache = {}
+
+    def load_session(self, key):
+        with self.lock:
+            if key in self.pending_sessions:
+                return json.loads(self.pending_sessions[key])
+            row = self.conn.execute("SELECT state FROM sessions WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def load_stages(self, key):
+        '''
+        Returns {stage name: content} for a session
+        '''
+        with self.lock:
+            rows = self.conn.execute("SELECT name, content FROM stages WHERE key = ?", (key,)).fetchall()
+            stages = dict(rows)
+            for (k, name), content in self.pending_stages.items():
+                if k == key:
+                    stages[name] = content
+        return {name: content for name, content in stages.items() if content is not None}
+
+    def load_stage(self, key, name):
+        with self.lock:
+            if (key, name) in self.pending_stages:
+                return self.pending_stages[(key, name)]
+            row = self.conn.execute("SELECT content FROM stages WHERE key = ? AND name = ?",
+                                    (key, name)).fetchone()
+        return row[0] if row else None
+
+    def save_session(self, key, state):
+        with self.lock:
+            self.pending_sessions[key] = json.dumps(state)
+
+    def save_stage(self, key, name, content):
+        '''
+        Record a stage output (str or bytes); None deletes the stage
+        '''
+        with self.lock:
+            self.pending_stages[(key, name)] = content
+
+    def cache_get(self, key):
+        with self.lock:
+            if key in self.pending_cache:
+                return self.pending_cache[key]
+            row = self.conn.execute("SELECT value FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def cache_put(self, key, value):
+        with self.lock:
+            self.pending_cache[key] = value
+
+    def flush(self):
+        with self.lock:
+            if not (self.pending_sessions or self.pending_stages or self.pending_cache):
+                return
+            now = time.time()
+            sessions, self.pending_sessions = self.pending_sessions, {}
+            stages, self.pending_stages = self.pending_stages, {}
+            cache, self.pending_cache = self.pending_cache, {}
+
+            try:
+                self.conn.execute("BEGIN")
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO sessions (key, state, updated) VALUES (?, ?, ?)",
+                    [(key, state, now) for key, state in sessions.items()])
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO stages (key, name, content, updated) VALUES (?, ?, ?, ?)",
+                    [(key, name, content, now) for (key, name), content in stages.items() if content is not None])
+                self.conn.executemany(
+                    "DELETE FROM stages WHERE key = ? AND name = ?",
+                    [(key, name) for (key, name), content in stages.items() if content is None])
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, updated) VALUES (?, ?, ?)",
+                    [(key, value, now) for key, value in cache.items()])
+                self.conn.execute("COMMIT")
+            except Exception:
+                if self.conn.in_transaction:
+                    self.conn.execute("ROLLBACK")
+                # Put the batch back for the next flush; anything buffered since is newer and wins
+                self.pending_sessions = {**sessions, **self.pending_sessions}
+                self.pending_stages = {**stages, **self.pending_stages}
+                self.pending_cache = {**cache, **self.pending_cache}
+                raise
+
+    async def run_flusher(self, interval=FLUSH_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.flush()
+            except Exception as e: # e.g. "database is locked" by another shard process; retried next tick
+                print(f"[WARN] Checkpoint flush failed, will retry: {e}")
+
+BACKENDS = {"sqlite": SQLiteBackend, "memory": MemoryBackend}
+_SHARED = None
+
+def open_backend(kind=STATE_BACKEND):
+    if kind not in BACKENDS:
+        raise ValueError(f"Unknown STATE_BACKEND {kind!r}; expected one of {sorted(BACKENDS)}")
+    return BACKENDS[kind]()
+
+def shared_backend():
+    '''
+    The process-wide backend, opened on first use and flushed at exit
+    '''
+    global _SHARED
+    if _SHARED is None:
+        _SHARED = open_backend()
+        atexit.register(_SHARED.flush)
+    return _SHARED